@@ -1,6 +1,6 @@
 # Modules package for the agent backend
 from .config import RAG_SERVICE_URL, GYM_API_URL, OLLAMA_MODEL_NAME
-from .tools import external_rag_search_tool, check_gym_availability, book_gym_slot, ALL_TOOLS_LIST
+from .tools import external_rag_search_tool, check_gym_availability, book_gym_slot, book_gym_group, ALL_TOOLS_LIST
 from .state import AgentState, get_current_agent_scratchpad, update_state_after_llm, update_state_after_tool
 from .prompt import RAG_SYSTEM_PROMPT
 from .agent import RagAgent
@@ -13,6 +13,7 @@ __all__ = [
     'external_rag_search_tool',
     'check_gym_availability',
     'book_gym_slot',
+    'book_gym_group',
     'ALL_TOOLS_LIST',
     'AgentState',
     'get_current_agent_scratchpad',
@@ -4,7 +4,13 @@ import redis
 # --- Configuración del Agente y Herramienta ---
 RAG_SERVICE_URL = os.getenv('RAG_SERVICE_URL', 'http://localhost:8080')
 GYM_API_URL = os.getenv('GYM_API_URL', 'http://localhost:8000')
+# Franjas libres más cercanas que pide check_gym_availability como alternativas
+GYM_NEAREST_SLOTS = int(os.getenv('GYM_NEAREST_SLOTS', '5'))
+# Base de datos de servicios a la que escuchar los cambios de disponibilidad (vacía: revalidar siempre con ETag)
+AVAILABILITY_FEED_URL = os.getenv('AVAILABILITY_FEED_URL', '')
 OLLAMA_MODEL_NAME = os.getenv('OLLAMA_MODEL_NAME', "caporti/qwen3-capor")
+# Presupuesto de tokens del contexto RAG que se inserta en el prompt (0 desactiva la compactación)
+RAG_CONTEXT_MAX_TOKENS = int(os.getenv('RAG_CONTEXT_MAX_TOKENS', '1200'))
 
 # --- Configuración Redis para Persistencia ---
 REDIS_HOST = os.getenv('REDIS_HOST', 'redis_stack_container')
@@ -1,11 +1,13 @@
 import traceback
+import threading
 import time
 from datetime import datetime, timezone
 from langchain_core.tools import tool
 import requests
 import json
 
-from .config import RAG_SERVICE_URL, GYM_API_URL, OLLAMA_MODEL_NAME
+from .config import (RAG_SERVICE_URL, GYM_API_URL, GYM_NEAREST_SLOTS, OLLAMA_MODEL_NAME, RAG_CONTEXT_MAX_TOKENS,
+                     AVAILABILITY_FEED_URL)
 from .metriclogger import MetricLogger
 
 import logging
@@ -14,6 +16,79 @@ logger = logging.getLogger(__name__)
 # Inicializar metric logger
 metric_logger = MetricLogger()
 
+# Última respuesta de /availability por consulta: (ETag, franjas, vigente, hora), la más antigua sale primero.
+# Una entrada vigente se sirve sin llamar a la API: el feed de cambios no ha avisado de nada desde que se guardó.
+# Las consultas `nearest` además caducan al cambiar la hora, igual que su ETag en la API: una franja puede
+# haber empezado sin que llegue ningún NOTIFY
+AVAILABILITY_CACHE_SIZE = 256
+_availability_cache = {}
+_availability_lock = threading.Lock()
+_feed_generation = 0
+_feed = None
+
+
+def _ensure_availability_feed():
+    """Arrancar una sola vez el suscriptor de cambios de disponibilidad (si hay AVAILABILITY_FEED_URL)"""
+    global _feed
+    with _availability_lock:
+        if _feed is not None or not AVAILABILITY_FEED_URL:
+            return _feed
+        try:
+            from src.generator.changefeed import AvailabilitySubscriber
+        except ImportError:
+            logger.warning("⚠️ Feed de disponibilidad no disponible, se revalida siempre con ETag")
+            _feed = False
+            return _feed
+        _feed = AvailabilitySubscriber(AVAILABILITY_FEED_URL)
+        _feed.subscribe(_on_availability_change)
+        _feed.on_reset(_expire_availability_cache)
+        _feed.start()
+        return _feed
+
+
+def _on_availability_change(change):
+    if change.get("service") == "gimnasio":
+        _expire_availability_cache()
+
+
+def _expire_availability_cache():
+    """Las entradas conservan su ETag: si su día no ha cambiado, la revalidación es un 304"""
+    global _feed_generation
+    with _availability_lock:
+        _feed_generation += 1
+        for key, (etag, slots, _, hour) in list(_availability_cache.items()):
+            _availability_cache[key] = (etag, slots, False, hour)
+
+
+def _current_hour():
+    return datetime.now().strftime("%Y%m%d%H")
+
+
+def _is_current(cached, nearest):
+    """La entrada se puede servir sin llamar a la API"""
+    if not (cached and cached[2] and _feed and _feed.connected.is_set()):
+        return False
+    return not nearest or cached[3] == _current_hour()
+
+
+def _store_availability(cache_key, etag, slots_data, generation, hour):
+    with _availability_lock:
+        # Si ha llegado un cambio durante la petición, la respuesta puede ser anterior a él
+        current = bool(_feed) and _feed.connected.is_set() and generation == _feed_generation
+        if cache_key not in _availability_cache and len(_availability_cache) >= AVAILABILITY_CACHE_SIZE:
+            _availability_cache.pop(next(iter(_availability_cache)))
+        _availability_cache[cache_key] = (etag, slots_data, current, hour)
+
+def _parse_slot_time(value):
+    """Fecha-hora sin zona, como la normaliza la API de servicios (una hora con zona pasa a UTC); None si no es válida"""
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
 # --- HERRAMIENTAS ---
 @tool
 def external_rag_search_tool(query: str, limit: int = 3, score_threshold: float = 0.3) -> str:
@@ -29,6 +104,10 @@ def external_rag_search_tool(query: str, limit: int = 3, score_threshold: float
         logger.info(f"🛠️ Herramienta RAG Externa llamada con: query='{query}', limit={limit}, threshold={score_threshold}")
         search_endpoint = f"{RAG_SERVICE_URL}/search"
         payload = {"query": query, "limit": limit, "score_threshold": score_threshold}
+        if RAG_CONTEXT_MAX_TOKENS > 0:
+            # La API fusiona chunks solapados y recorta el contexto antes de devolverlo
+            payload["compact"] = True
+            payload["max_tokens"] = RAG_CONTEXT_MAX_TOKENS
         
         response = requests.post(search_endpoint, json=payload, timeout=45)
         response.raise_for_status()
@@ -86,7 +165,7 @@ def check_gym_availability(target_date: str) -> str:
     Parámetro:
     - target_date: Una cadena en formato ISO 8601 (YYYY-MM-DDTHH:MM:SS) representando la fecha y hora para comprobar la disponibilidad.
                    Si el usuario solo da una fecha, puedes asumir T08:00:00 para ver los primeros horarios disponibles de ese día.
-    Devuelve una lista de horarios disponibles o un mensaje si no hay disponibilidad. Esta herramienta es de solo lectura y no hace reservas.
+    Devuelve si esa hora tiene plazas libres y, si no, los horarios libres más cercanos como alternativa. Esta herramienta es de solo lectura y no hace reservas.
     """
     start_time = time.time()  # ✅ INICIO MÉTRICA
     
@@ -94,17 +173,49 @@ def check_gym_availability(target_date: str) -> str:
         logger.info(f"🛠️ Herramienta Check Gym Availability llamada con: target_date='{target_date}'")
         url = f"{GYM_API_URL}/availability"
         payload = {"service_name": "gimnasio", "start_time": target_date}
-        headers = {"Content-Type": "application/json"}
-        
-        response = requests.post(url, json=payload, headers=headers, timeout=15)
-        
-        if response.status_code == 200:
-            slots_data = response.json()
+        if "T" in target_date:
+            # La API devuelve directamente las franjas con plazas libres más cercanas a esa hora
+            payload["nearest"] = GYM_NEAREST_SLOTS
+        _ensure_availability_feed()
+        cache_key = tuple(sorted(payload.items()))
+        with _availability_lock:
+            cached = _availability_cache.get(cache_key)
+            generation = _feed_generation
+        # Hora en la que se pide: si la respuesta llega ya en la siguiente, caduca antes, nunca después
+        hour = _current_hour()
+
+        if _is_current(cached, "nearest" in payload):
+            logger.info(f"Disponibilidad para {target_date} servida de caché (sin cambios notificados)")
+            slots_data = cached[1]
+        else:
+            # Revalidar con el ETag de la última respuesta: si nada ha cambiado la API responde 304 sin cuerpo
+            headers = {"If-None-Match": cached[0]} if cached else {}
+            response = requests.get(url, params=payload, headers=headers, timeout=15)
+            if response.status_code == 304 and cached:
+                logger.info(f"Disponibilidad sin cambios para {target_date} (304), usando la copia en caché")
+                slots_data = cached[1]
+                _store_availability(cache_key, cached[0], slots_data, generation, hour)
+            elif response.status_code == 200:
+                slots_data = response.json()
+                if response.headers.get("ETag"):
+                    _store_availability(cache_key, response.headers["ETag"], slots_data, generation, hour)
+            else:
+                slots_data = None
+
+        if slots_data is not None:
             if isinstance(slots_data, list) and slots_data:
                 start_times = [slot.get("start_time") for slot in slots_data if slot.get("start_time")][:5]
                 if start_times:
-                    if target_date in start_times:
-                        response_message = f"El horario {target_date} está disponible. Otros horarios cercanos disponibles: {json.dumps(start_times)}"
+                    # Se comparan fechas, no cadenas: la API acepta '...T08:00' o '...T08:00:00+02:00'
+                    target_dt = _parse_slot_time(target_date)
+                    matching = [start for start in start_times
+                                if target_dt is not None and _parse_slot_time(start) == target_dt]
+                    if matching:
+                        others = [start for start in start_times if start not in matching]
+                        response_message = f"El horario {target_date} está disponible. Otros horarios cercanos disponibles: {json.dumps(others)}"
+                    elif "nearest" in payload:
+                        response_message = (f"El horario {target_date} NO tiene plazas libres (está completo o no existe). "
+                                          f"Horarios libres más cercanos, del más próximo al más lejano: {json.dumps(start_times)}")
                     else:
                         response_message = f"Horarios disponibles encontrados para el gimnasio cerca de {target_date}: {json.dumps(start_times)}"
                 else:
@@ -149,53 +260,32 @@ def book_gym_slot(booking_date: str, user_name: str) -> str:
     
     try:
         logger.info(f"🛠️ Herramienta Book Gym Slot llamada para {user_name} en {booking_date}.")
-        avail_url = f"{GYM_API_URL}/availability"
-        avail_payload = {"service_name": "gimnasio", "start_time": booking_date}
+        # Una sola llamada: la API localiza la franja y reserva plaza de forma atómica
+        book_url = f"{GYM_API_URL}/booking/by-time"
+        booking_payload = {"service_name": "gimnasio", "start_time": booking_date, "guest_name": user_name}
         headers = {"Content-Type": "application/json"}
-        slot_id_to_book = None
-        
-        logger.debug(f"Verificando disponibilidad exacta para {booking_date} antes de reservar...")
-        avail_response = requests.post(avail_url, json=avail_payload, headers=headers, timeout=15)
-        
-        if avail_response.status_code == 200:
-            slots = avail_response.json()
-            if not isinstance(slots, list):
-                logger.error(f"Respuesta de disponibilidad para {booking_date} no fue una lista: {slots}")
-                response_message = f"No se pudo confirmar la disponibilidad del horario {booking_date} (formato de respuesta incorrecto)."
-            else:
-                for slot in slots:
-                    if slot.get("start_time") == booking_date:
-                        slot_id_to_book = slot.get("slot_id")
-                        logger.info(f"Slot ID {slot_id_to_book} encontrado para {booking_date}.")
-                        break
-                        
-                if not slot_id_to_book:
-                    logger.warning(f"El slot deseado {booking_date} no apareció en la lista de disponibilidad exacta.")
-                    sugerencias = [s.get("start_time") for s in slots if s.get("start_time")][:3]
-                    sugerencias_str = f" Horarios alternativos cercanos podrían ser: {', '.join(sugerencias)}." if sugerencias else ""
-                    response_message = (f"El horario deseado {booking_date} no está disponible o no se pudo confirmar.{sugerencias_str} "
-                                      f"Por favor, primero verifica la disponibilidad general con 'check_gym_availability'.")
-                else:
-                    # Intentar hacer la reserva
-                    logger.info(f"Intentando reservar slot ID {slot_id_to_book} para {user_name}...")
-                    book_url = f"{GYM_API_URL}/booking"
-                    booking_payload = {"slot_id": slot_id_to_book, "guest_name": user_name}
-                    book_response = requests.post(book_url, json=booking_payload, headers=headers, timeout=15)
-                    
-                    if book_response.status_code == 201:
-                        booking_data = book_response.json()
-                        logger.info(f"Reserva exitosa: {booking_data}")
-                        response_message = (f"Reserva exitosa para {booking_data.get('guest_name')} en el gimnasio. "
-                                          f"ID de la reserva: {booking_data.get('booking_id', 'No proporcionado')}, Slot ID: {booking_data.get('slot_id')}, Hora: {booking_date}.")
-                    elif book_response.status_code == 409:
-                        logger.warning(f"Conflicto de reserva para slot ID {slot_id_to_book}: {book_response.text[:200]}")
-                        response_message = f"Conflicto de reserva: El horario {booking_date} (slot ID: {slot_id_to_book}) ya está reservado o lleno."
-                    else:
-                        logger.error(f"Fallo la reserva (código {book_response.status_code}): {book_response.text[:200]}")
-                        response_message = f"Fallo la reserva del gimnasio (código {book_response.status_code}): {book_response.text[:200]}"
+        book_response = requests.post(book_url, json=booking_payload, headers=headers, timeout=15)
+
+        if book_response.status_code == 201:
+            booking_data = book_response.json()
+            logger.info(f"Reserva exitosa: {booking_data}")
+            response_message = (f"Reserva exitosa para {booking_data.get('guest_name')} en el gimnasio. "
+                              f"ID de la reserva: {booking_data.get('id', 'No proporcionado')}, Slot ID: {booking_data.get('slot_id')}, Hora: {booking_date}.")
+        elif book_response.status_code == 409:
+            logger.warning(f"Conflicto de reserva para {booking_date}: {book_response.text[:200]}")
+            response_message = (f"Conflicto de reserva: El horario {booking_date} ya está completo. "
+                              f"Por favor, verifica otros horarios con 'check_gym_availability'.")
+        elif book_response.status_code == 503:
+            logger.warning(f"Franja del gimnasio muy solicitada a las {booking_date}: {book_response.text[:200]}")
+            response_message = (f"El horario {booking_date} está recibiendo muchas reservas en este momento y no se pudo confirmar. "
+                              f"Vuelve a intentar la reserva en unos segundos.")
+        elif book_response.status_code == 404:
+            logger.warning(f"No existe franja del gimnasio a las {booking_date}: {book_response.text[:200]}")
+            response_message = (f"No existe ningún horario del gimnasio que empiece exactamente en {booking_date}. "
+                              f"Por favor, primero verifica la disponibilidad general con 'check_gym_availability'.")
         else:
-            logger.error(f"No se pudo verificar la disponibilidad antes de reservar (código: {avail_response.status_code}). Respuesta: {avail_response.text[:200]}")
-            response_message = f"No se pudo confirmar la disponibilidad del horario {booking_date} antes de intentar la reserva (Error API: {avail_response.status_code})."
+            logger.error(f"Fallo la reserva (código {book_response.status_code}): {book_response.text[:200]}")
+            response_message = f"Fallo la reserva del gimnasio (código {book_response.status_code}): {book_response.text[:200]}"
         
         # ✅ REGISTRAR MÉTRICA EXITOSA
         execution_time = time.time() - start_time
@@ -215,4 +305,66 @@ def book_gym_slot(booking_date: str, user_name: str) -> str:
         logger.error(f"❌ Error inesperado en Book Gym Slot: {e}\n{traceback.format_exc()}")
         return f"Error inesperado al intentar reservar el gimnasio: {str(e)}"
 
-ALL_TOOLS_LIST = [external_rag_search_tool, check_gym_availability, book_gym_slot]
\ No newline at end of file
+@tool
+def book_gym_group(booking_dates: list[str], guest_names: list[str]) -> str:
+    """
+    Reserva el gimnasio para un grupo (familia, grupo turístico) en una o varias horas con una sola llamada.
+    ADVERTENCIA: Esta acción crea reservas y tiene efectos secundarios. O se reservan TODAS las plazas o ninguna.
+    SOLO usa esta herramienta después de confirmar las horas EXACTAS y los nombres de TODOS los huéspedes.
+    Parámetros:
+    - booking_dates: Lista de cadenas en formato ISO 8601 (YYYY-MM-DDTHH:MM:SS), una por cada hora a reservar.
+    - guest_names: Lista con el nombre completo de cada huésped. Cada huésped queda reservado en todas las horas.
+    """
+    start_time = time.time()  # ✅ INICIO MÉTRICA
+
+    try:
+        logger.info(f"🛠️ Herramienta Book Gym Group llamada para {guest_names} en {booking_dates}.")
+        # Una sola llamada: la API comprueba la capacidad de todas las franjas y reserva todo o nada
+        book_url = f"{GYM_API_URL}/booking/group"
+        booking_payload = {"service_name": "gimnasio", "start_times": booking_dates, "guest_names": guest_names}
+        headers = {"Content-Type": "application/json"}
+        book_response = requests.post(book_url, json=booking_payload, headers=headers, timeout=15)
+
+        if book_response.status_code == 201:
+            bookings = book_response.json().get("bookings", [])
+            logger.info(f"Reserva de grupo exitosa: {len(bookings)} reservas")
+            summary = "; ".join(f"{b.get('guest_name')} a las {b.get('start_time')} (ID {b.get('id')})" for b in bookings)
+            response_message = f"Reserva de grupo exitosa en el gimnasio ({len(bookings)} reservas): {summary}."
+        elif book_response.status_code == 409:
+            conflicts = book_response.json().get("conflicts", [])
+            logger.warning(f"Conflicto en reserva de grupo: {book_response.text[:200]}")
+            detail = ", ".join(f"{c.get('start_time')} ({c.get('available_slots')} plazas libres)" for c in conflicts)
+            response_message = (f"No se ha reservado nada: no hay plazas para los {len(guest_names)} huéspedes en: {detail}. "
+                              f"Por favor, verifica otros horarios con 'check_gym_availability'.")
+        elif book_response.status_code == 503:
+            logger.warning(f"Franjas del gimnasio muy solicitadas en {booking_dates}: {book_response.text[:200]}")
+            response_message = ("Las horas solicitadas están recibiendo muchas reservas en este momento y no se pudo confirmar el grupo. "
+                              "No se ha reservado nada. Vuelve a intentar la reserva en unos segundos.")
+        elif book_response.status_code == 404:
+            missing = book_response.json().get("missing", booking_dates)
+            logger.warning(f"No existen franjas del gimnasio en {missing}: {book_response.text[:200]}")
+            response_message = (f"No se ha reservado nada: no existe ningún horario del gimnasio que empiece exactamente en {', '.join(missing)}. "
+                              f"Por favor, primero verifica la disponibilidad general con 'check_gym_availability'.")
+        else:
+            logger.error(f"Fallo la reserva de grupo (código {book_response.status_code}): {book_response.text[:200]}")
+            response_message = f"Fallo la reserva de grupo del gimnasio (código {book_response.status_code}): {book_response.text[:200]}"
+
+        # ✅ REGISTRAR MÉTRICA EXITOSA
+        execution_time = time.time() - start_time
+        metric_logger.log_metric(datetime.now(timezone.utc), OLLAMA_MODEL_NAME, "tool_group_booking", execution_time)
+
+        return response_message
+
+    except requests.exceptions.RequestException as e:
+        execution_time = time.time() - start_time
+
+        logger.error(f"❌ Error de red en Book Gym Group: {e}")
+        return f"Error de red al intentar reservar el gimnasio para el grupo: {str(e)}"
+
+    except Exception as e:
+        execution_time = time.time() - start_time
+
+        logger.error(f"❌ Error inesperado en Book Gym Group: {e}\n{traceback.format_exc()}")
+        return f"Error inesperado al intentar reservar el gimnasio para el grupo: {str(e)}"
+
+ALL_TOOLS_LIST = [external_rag_search_tool, check_gym_availability, book_gym_slot, book_gym_group]
\ No newline at end of file
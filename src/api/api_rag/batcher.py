@@ -0,0 +1,81 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List
+
+from metrics import EMBED_BATCH_SIZE, EMBED_BATCH_WAIT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingBatcher:
+    """
+    Agrupa peticiones de embedding concurrentes en una sola llamada a Ollama.
+
+    Cada petición deja su texto en una cola y espera un Future. Un hilo de
+    fondo recoge textos durante `max_wait_ms` o hasta `max_batch` elementos,
+    envía el lote con `embed_many` y reparte los vectores a quien los pidió.
+    Mientras un lote está en vuelo, el siguiente se va acumulando.
+    """
+
+    def __init__(self, embed_many: Callable[[List[str]], List[List[float]]],
+                 max_batch: int = 16, max_wait_ms: float = 5.0):
+        self.embed_many = embed_many
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._thread.start()
+
+    def embed(self, text: str, timeout: float = 60.0) -> List[float]:
+        """Obtener el embedding de un texto a través del lote en curso"""
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put((text, future, time.perf_counter()))
+        return future.result(timeout=timeout)
+
+    def _collect(self) -> List[tuple]:
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            dispatched_at = time.perf_counter()
+            for _, _, enqueued_at in batch:
+                EMBED_BATCH_WAIT_SECONDS.observe(dispatched_at - enqueued_at)
+            EMBED_BATCH_SIZE.observe(len(batch))
+
+            # Los textos repetidos dentro del lote se envían una sola vez
+            unique_texts = list(dict.fromkeys(text for text, _, _ in batch))
+            try:
+                vectors = self.embed_many(unique_texts)
+                if len(vectors) != len(unique_texts):
+                    raise ValueError(f"Ollama devolvió {len(vectors)} embeddings para {len(unique_texts)} textos")
+                by_text = dict(zip(unique_texts, vectors))
+                for text, future, _ in batch:
+                    future.set_result(by_text[text])
+            except Exception as e:
+                logger.error(f"❌ Error en lote de {len(batch)} embeddings: {e}")
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
@@ -0,0 +1,90 @@
+"""
+Informe de reducción de tokens de la compactación de contexto.
+
+Lanza un conjunto de consultas de ejemplo contra la API de búsqueda en
+ejecución, con y sin compactación, y compara el tamaño del contexto que
+`external_rag_search_tool` insertaría en el prompt del LLM.
+
+Uso:
+    python benchmarks/compaction_report.py [--url http://localhost:8080] [--limit 5] [--max-tokens 1200]
+"""
+import argparse
+import math
+import sys
+
+import requests
+
+SAMPLE_QUERIES = [
+    "¿Cuál es la política de cancelación?",
+    "¿A qué hora es el check-in y el check-out?",
+    "¿Se admiten mascotas en el hotel?",
+    "¿Qué métodos de pago aceptan?",
+    "¿Se puede fumar en las habitaciones?",
+    "¿Qué edad mínima hay para alojarse sin tutor?",
+    "¿Cuánto cuesta una cama supletoria?",
+    "¿Qué pasa si el hotel tiene overbooking?",
+    "¿Cuánto tiempo guardan los objetos perdidos?",
+    "¿Cuáles son las horas de silencio?",
+    "¿Qué ventajas tiene el programa myBarceló?",
+    "¿Qué equipamiento de accesibilidad hay?",
+]
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / 4) if text else 0
+
+
+def format_context(results) -> str:
+    """Mismo formato que usa external_rag_search_tool para el prompt"""
+    parts = [
+        f"[Resultado {i+1}] Fuente: {doc.get('filename', 'Fuente desconocida')} (Relevancia: {doc.get('score', 0.0):.2f})\n"
+        f"Contenido: {doc.get('text', 'Contenido no disponible')}\n---"
+        for i, doc in enumerate(results)
+    ]
+    return "Información recuperada de la base de conocimientos:\n\n" + "\n".join(parts)
+
+
+def run_query(url: str, query: str, limit: int, max_tokens):
+    payload = {"query": query, "limit": limit, "score_threshold": 0.3}
+    if max_tokens is not None:
+        payload.update({"compact": True, "max_tokens": max_tokens})
+    response = requests.post(
+        f"{url}/search",
+        json=payload,
+        headers={"Cache-Control": "no-cache"},
+        timeout=60
+    )
+    response.raise_for_status()
+    return response.json()["results"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8080")
+    parser.add_argument("--limit", type=int, default=5)
+    parser.add_argument("--max-tokens", type=int, default=1200)
+    args = parser.parse_args()
+
+    total_before = total_after = 0
+    print(f"{'consulta':<50} {'res':>7} {'tokens':>15} {'ahorro':>8}")
+    for query in SAMPLE_QUERIES:
+        try:
+            raw = run_query(args.url, query, args.limit, None)
+            compacted = run_query(args.url, query, args.limit, args.max_tokens)
+        except requests.exceptions.RequestException as e:
+            print(f"❌ Error consultando '{query}': {e}")
+            sys.exit(1)
+
+        before = estimate_tokens(format_context(raw))
+        after = estimate_tokens(format_context(compacted))
+        total_before += before
+        total_after += after
+        saving = (1 - after / before) * 100 if before else 0.0
+        print(f"{query[:50]:<50} {len(raw):>3}→{len(compacted):<3} {before:>6}→{after:<6} {saving:>7.1f}%")
+
+    saving = (1 - total_after / total_before) * 100 if total_before else 0.0
+    print(f"\nTOTAL: ~{total_before} → ~{total_after} tokens de prompt ({saving:.1f}% menos)")
+
+
+if __name__ == "__main__":
+    main()
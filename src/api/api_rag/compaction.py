@@ -0,0 +1,161 @@
+import math
+import re
+from typing import Any, Dict, List, Optional
+
+# Solapamiento máximo que se busca al fusionar chunks contiguos (el loader usa 200 caracteres)
+MAX_OVERLAP_CHARS = 400
+# Por debajo de este número de caracteres coincidentes no se considera solapamiento real
+MIN_OVERLAP_CHARS = 20
+# Similitud Jaccard (trigramas de palabras) a partir de la cual dos textos son casi duplicados
+NEAR_DUPLICATE_THRESHOLD = 0.85
+# No merece la pena añadir un fragmento recortado más corto que esto
+MIN_TRIMMED_CHARS = 80
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimación de tokens (~4 caracteres por token) sin depender de un tokenizador"""
+    return math.ceil(len(text) / 4) if text else 0
+
+
+def _overlap_length(left: str, right: str) -> int:
+    """Longitud del sufijo de 'left' que coincide con el prefijo de 'right'"""
+    limit = min(len(left), len(right), MAX_OVERLAP_CHARS)
+    for size in range(limit, MIN_OVERLAP_CHARS - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def _strip_shared_header(previous: str, text: str) -> str:
+    """Quitar de 'text' las líneas iniciales que repite de 'previous' (ruta de cabeceras del chunker estructural)"""
+    previous_lines = previous.split("\n")
+    lines = text.split("\n")
+    shared = 0
+    while shared < min(len(previous_lines), len(lines)) - 1 and previous_lines[shared] == lines[shared]:
+        shared += 1
+    return "\n".join(lines[shared:])
+
+
+def _shingles(text: str, size: int = 3) -> set:
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def _is_near_duplicate(candidate: Dict[str, Any], kept: Dict[str, Any]) -> bool:
+    if candidate["text"] in kept["text"]:
+        return True
+    a, b = candidate["_shingles"], kept["_shingles"]
+    if not a or not b:
+        return False
+    return len(a & b) / len(a | b) >= NEAR_DUPLICATE_THRESHOLD
+
+
+def merge_adjacent(documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Fusionar chunks contiguos o solapados del mismo fichero"""
+    by_file: Dict[str, List[Dict[str, Any]]] = {}
+    for doc in documents:
+        by_file.setdefault(doc.get("filename", ""), []).append(doc)
+
+    merged = []
+    for filename, docs in by_file.items():
+        docs = sorted(docs, key=lambda d: d.get("chunk_index", 0))
+        current = None
+        for doc in docs:
+            index = doc.get("chunk_index", 0)
+            if current is not None and index - current["chunk_indices"][-1] <= 1:
+                if index != current["chunk_indices"][-1]:
+                    text = _strip_shared_header(current["_last_text"], doc["text"])
+                    overlap = _overlap_length(current["text"], text)
+                    separator = "" if overlap else "\n"
+                    current["text"] = current["text"] + separator + text[overlap:]
+                    current["chunk_indices"].append(index)
+                    current["_last_text"] = doc["text"]
+                current["score"] = max(current["score"], doc.get("score", 0.0))
+                continue
+            if current is not None:
+                current.pop("_last_text")
+                merged.append(current)
+            current = {
+                "text": doc.get("text", ""),
+                "filename": filename,
+                "score": doc.get("score", 0.0),
+                "chunk_index": index,
+                "chunk_indices": [index],
+                "file_type": doc.get("file_type", ""),
+                "_last_text": doc.get("text", "")
+            }
+        if current is not None:
+            current.pop("_last_text")
+            merged.append(current)
+    return merged
+
+
+def remove_near_duplicates(documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Eliminar textos casi idénticos conservando el de mayor relevancia"""
+    kept: List[Dict[str, Any]] = []
+    for doc in sorted(documents, key=lambda d: d["score"], reverse=True):
+        doc["_shingles"] = _shingles(doc["text"])
+        if any(_is_near_duplicate(doc, other) for other in kept):
+            continue
+        kept.append(doc)
+    for doc in kept:
+        doc.pop("_shingles", None)
+    return kept
+
+
+def trim_to_budget(documents: List[Dict[str, Any]],
+                   max_chars: Optional[int] = None,
+                   max_tokens: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Recortar los resultados (ya ordenados por relevancia) al presupuesto indicado"""
+    budget = None
+    if max_chars:
+        budget = max_chars
+    if max_tokens:
+        budget = min(budget, max_tokens * 4) if budget else max_tokens * 4
+    if budget is None:
+        return documents
+
+    trimmed = []
+    remaining = budget
+    for doc in documents:
+        if len(doc["text"]) <= remaining:
+            trimmed.append(doc)
+            remaining -= len(doc["text"])
+            continue
+        if remaining >= MIN_TRIMMED_CHARS:
+            cut = doc["text"].rfind(" ", 0, remaining - 1)
+            text = doc["text"][:cut if cut > 0 else remaining - 1].rstrip() + "…"
+            trimmed.append({**doc, "text": text, "truncated": True})
+        break
+    return trimmed
+
+
+def compact_results(documents: List[Dict[str, Any]],
+                    max_chars: Optional[int] = None,
+                    max_tokens: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Compactar los resultados de búsqueda antes de devolverlos al agente:
+    fusiona chunks contiguos, elimina casi duplicados y aplica el presupuesto.
+    """
+    input_chars = sum(len(doc.get("text", "")) for doc in documents)
+    compacted = trim_to_budget(
+        remove_near_duplicates(merge_adjacent(documents)),
+        max_chars=max_chars,
+        max_tokens=max_tokens
+    )
+    output_chars = sum(len(doc["text"]) for doc in compacted)
+    return {
+        "results": compacted,
+        "stats": {
+            "input_results": len(documents),
+            "output_results": len(compacted),
+            "input_chars": input_chars,
+            "output_chars": output_chars,
+            "input_tokens_estimate": sum(estimate_tokens(doc.get("text", "")) for doc in documents),
+            "output_tokens_estimate": sum(estimate_tokens(doc["text"]) for doc in compacted)
+        }
+    }
@@ -1,8 +1,26 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, make_response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from qdrant_client import QdrantClient
+from qdrant_client.models import QuantizationSearchParams, SearchParams
 import requests
 import logging
 import os
+import time
+from typing import Optional
+
+from batcher import EmbeddingBatcher
+from cache import SearchCache
+from embedding_store import EmbeddingStore
+from matryoshka import reduce_dimension
+from compaction import compact_results
+from metrics import (
+    SEARCH_CACHE_LOOKUPS,
+    SEARCH_EMPTY_RESULTS,
+    SEARCH_FALLBACKS,
+    SEARCH_REQUESTS,
+    SEARCH_RESULTS,
+    StageTimer,
+)
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
@@ -17,33 +35,132 @@ OLLAMA_HOST = os.getenv('OLLAMA_HOST', 'localhost')
 OLLAMA_PORT = int(os.getenv('OLLAMA_PORT', '11434'))
 COLLECTION_NAME = os.getenv('COLLECTION_NAME', 'documents')
 EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL', 'nomic-embed-text')
+# Dimensión Matryoshka de las consultas; debe coincidir con la del rag_loader (0 = completa)
+EMBEDDING_DIM = int(os.getenv('EMBEDDING_DIM', '0'))
+# Parámetros de búsqueda en tiempo de consulta (ver perfiles de colección del rag_loader)
+SEARCH_HNSW_EF = int(os.getenv('SEARCH_HNSW_EF', '0')) or None
+SEARCH_QUANTIZATION_RESCORE = os.getenv('SEARCH_QUANTIZATION_RESCORE', 'true').lower() == 'true'
+SEARCH_QUANTIZATION_OVERSAMPLING = float(os.getenv('SEARCH_QUANTIZATION_OVERSAMPLING', '0')) or None
+# Micro-batching de embeddings concurrentes (EMBED_BATCH_MAX_SIZE=1 desactiva)
+EMBED_BATCH_MAX_SIZE = int(os.getenv('EMBED_BATCH_MAX_SIZE', '16'))
+EMBED_BATCH_MAX_WAIT_MS = float(os.getenv('EMBED_BATCH_MAX_WAIT_MS', '5'))
+# Almacén persistente de embeddings compartido con el rag_loader (vacío desactiva)
+EMBEDDING_CACHE_DIR = os.getenv('EMBEDDING_CACHE_DIR', '')
+# El almacén es append-only: por encima de este tamaño ya no se guardan embeddings de consultas (0 = nunca)
+EMBEDDING_CACHE_QUERY_MAX_BYTES = int(os.getenv('EMBEDDING_CACHE_QUERY_MAX_BYTES', str(64 * 1024 * 1024)))
+# Caché de respuestas de /search (0 desactiva)
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv('SEARCH_CACHE_MAX_ENTRIES', '1024'))
+SEARCH_CACHE_MAX_BYTES = int(os.getenv('SEARCH_CACHE_MAX_BYTES', str(16 * 1024 * 1024)))
+# Segundos que se reutiliza el token de versión antes de volver a leerlo de Qdrant (0 = en cada petición)
+SEARCH_CACHE_VERSION_TTL = float(os.getenv('SEARCH_CACHE_VERSION_TTL', '0'))
+# Colección auxiliar donde el rag_loader publica el token de versión
+META_COLLECTION_NAME = f"{COLLECTION_NAME}_meta"
+VERSION_POINT_ID = 1
 
 # Inicializar clientes
 qdrant_client = QdrantClient(host=QDRANT_HOST, port=QDRANT_PORT)
 ollama_url = f"http://{OLLAMA_HOST}:{OLLAMA_PORT}"
+embedding_store = EmbeddingStore(EMBEDDING_CACHE_DIR, EMBEDDING_MODEL) if EMBEDDING_CACHE_DIR else None
+search_cache = SearchCache(max_entries=SEARCH_CACHE_MAX_ENTRIES, max_bytes=SEARCH_CACHE_MAX_BYTES)
+_version_state = {"token": None, "read_at": 0.0}
+search_params = SearchParams(
+    hnsw_ef=SEARCH_HNSW_EF,
+    quantization=QuantizationSearchParams(
+        rescore=SEARCH_QUANTIZATION_RESCORE,
+        oversampling=SEARCH_QUANTIZATION_OVERSAMPLING
+    )
+)
 
 logger.info(f"🔗 Conectando a Qdrant: {QDRANT_HOST}:{QDRANT_PORT}")
 logger.info(f"🔗 Conectando a Ollama: {OLLAMA_HOST}:{OLLAMA_PORT}")
 logger.info(f"🧠 Modelo de embeddings: {EMBEDDING_MODEL}")
 logger.info(f"📦 Colección: {COLLECTION_NAME}")
+logger.info(f"🎯 Parámetros de búsqueda: hnsw_ef={SEARCH_HNSW_EF}, rescore={SEARCH_QUANTIZATION_RESCORE}, oversampling={SEARCH_QUANTIZATION_OVERSAMPLING}")
+logger.info(f"📦 Micro-batching de embeddings: hasta {EMBED_BATCH_MAX_SIZE} consultas o {EMBED_BATCH_MAX_WAIT_MS} ms")
+logger.info(f"🗄️ Almacén de embeddings: {EMBEDDING_CACHE_DIR or 'desactivado'}")
+logger.info(f"🗃️ Caché de búsquedas: {SEARCH_CACHE_MAX_ENTRIES} entradas / {SEARCH_CACHE_MAX_BYTES} bytes")
+
+def embed_many(texts):
+    """Obtener los embeddings de varios textos en una sola llamada a Ollama"""
+    response = requests.post(
+        f"{ollama_url}/api/embed",
+        json={
+            "model": EMBEDDING_MODEL,
+            "input": texts
+        },
+        timeout=30
+    )
+    response.raise_for_status()
+    return response.json()["embeddings"]
+
+embedding_batcher = EmbeddingBatcher(
+    embed_many,
+    max_batch=EMBED_BATCH_MAX_SIZE,
+    max_wait_ms=EMBED_BATCH_MAX_WAIT_MS
+)
 
 def get_embedding(text: str):
-    """Obtener embedding usando Ollama"""
+    """Obtener embedding usando Ollama (reducido a EMBEDDING_DIM si está configurado)"""
     try:
-        response = requests.post(
-            f"{ollama_url}/api/embeddings",
-            json={
-                "model": EMBEDDING_MODEL,
-                "prompt": text
-            },
-            timeout=30
-        )
-        response.raise_for_status()
-        return response.json()["embedding"]
+        if embedding_store:
+            stored = embedding_store.get(text)
+            if stored is not None:
+                return reduce_dimension(stored, EMBEDDING_DIM)
+        if EMBED_BATCH_MAX_SIZE > 1:
+            embedding = embedding_batcher.embed(text, timeout=60)
+        else:
+            response = requests.post(
+                f"{ollama_url}/api/embeddings",
+                json={
+                    "model": EMBEDDING_MODEL,
+                    "prompt": text
+                },
+                timeout=30
+            )
+            response.raise_for_status()
+            embedding = response.json()["embedding"]
+        if embedding_store and embedding_store.vectors_bytes() < EMBEDDING_CACHE_QUERY_MAX_BYTES:
+            embedding_store.put_many([text], [embedding])
+        return reduce_dimension(embedding, EMBEDDING_DIM)
     except Exception as e:
         logger.error(f"❌ Error obteniendo embedding: {e}")
         raise
 
+def get_collection_version() -> Optional[str]:
+    """
+    Obtener el token de versión que el rag_loader publica tras cada ingesta.
+    Devuelve None si no se puede leer (sin ingestas todavía o Qdrant con
+    problemas): sin token no hay forma de validar lo cacheado.
+    """
+    now = time.monotonic()
+    if _version_state["token"] is not None and now - _version_state["read_at"] < SEARCH_CACHE_VERSION_TTL:
+        return _version_state["token"]
+    try:
+        points = qdrant_client.retrieve(
+            collection_name=META_COLLECTION_NAME,
+            ids=[VERSION_POINT_ID],
+            with_payload=True,
+            with_vectors=False
+        )
+        version = points[0].payload.get("version") if points else None
+    except Exception as e:
+        # Sin colección de metadatos (loader antiguo o aún sin ingestas)
+        logger.debug(f"Token de versión no disponible: {e}")
+        version = None
+    if version is None:
+        return None
+    token = str(version)
+    _version_state["token"] = token
+    _version_state["read_at"] = now
+    return token
+
+def cache_bypass_requested() -> bool:
+    """El cliente puede saltarse la caché con Cache-Control: no-cache/no-store o X-Search-Cache: bypass"""
+    cache_control = request.headers.get('Cache-Control', '').lower()
+    if 'no-cache' in cache_control or 'no-store' in cache_control:
+        return True
+    return request.headers.get('X-Search-Cache', '').lower() == 'bypass'
+
 @app.route('/health', methods=['GET'])
 def health():
     """Endpoint de salud"""
@@ -52,6 +169,10 @@ def health():
         collections = qdrant_client.get_collections()
         qdrant_status = "ok"
         
+        # En modo blue/green COLLECTION_NAME es un alias: informar de la versión servida
+        collection_target = next((alias.collection_name for alias in qdrant_client.get_aliases().aliases
+                                  if alias.alias_name == COLLECTION_NAME), COLLECTION_NAME)
+        
         # Verificar conexión a Ollama
         ollama_response = requests.get(f"{ollama_url}/api/tags", timeout=5)
         ollama_status = "ok" if ollama_response.status_code == 200 else "error"
@@ -61,7 +182,9 @@ def health():
             "qdrant": qdrant_status,
             "ollama": ollama_status,
             "collection": COLLECTION_NAME,
-            "embedding_model": EMBEDDING_MODEL
+            "collection_target": collection_target,
+            "embedding_model": EMBEDDING_MODEL,
+            "embedding_dim": EMBEDDING_DIM or None
         })
     except Exception as e:
         return jsonify({
@@ -72,50 +195,101 @@ def health():
 @app.route('/search', methods=['POST'])
 def search():
     """Endpoint principal de búsqueda"""
+    timer = StageTimer()
+    request_start = time.perf_counter()
+    
+    def finish(http_response, status: str):
+        timer.record("total", time.perf_counter() - request_start)
+        SEARCH_REQUESTS.labels(status=status).inc()
+        http_response.headers['Server-Timing'] = timer.server_timing()
+        return http_response
+    
     try:
         # Obtener la pregunta del request
         data = request.get_json()
         
         if not data or 'query' not in data:
-            return jsonify({
+            return finish(make_response(jsonify({
                 "error": "Campo 'query' requerido",
                 "example": {"query": "servicios del hotel"}
-            }), 400
+            }), 400), "bad_request")
         
         query = data['query'].strip()
         
         if not query:
-            return jsonify({
+            return finish(make_response(jsonify({
                 "error": "La consulta no puede estar vacía"
-            }), 400
+            }), 400), "bad_request")
         
         # Parámetros opcionales
         limit = int(data.get('limit', 5))
         score_threshold = float(data.get('score_threshold', 0.5))
+        # Compactación de contexto: fusiona chunks solapados y recorta al presupuesto
+        max_chars = int(data['max_chars']) if data.get('max_chars') else None
+        max_tokens = int(data['max_tokens']) if data.get('max_tokens') else None
+        compact = bool(data.get('compact', False)) or bool(max_chars or max_tokens)
+        
+        logger.info(f"🔍 Búsqueda: '{query}' (limit={limit}, threshold={score_threshold}, compact={compact})")
         
-        logger.info(f"🔍 Búsqueda: '{query}' (limit={limit}, threshold={score_threshold})")
+        # Consultar la caché de respuestas
+        bypass = cache_bypass_requested() or not search_cache.enabled
+        cache_key = None
+        cached = None
+        if not bypass:
+            with timer.stage("cache"):
+                version = get_collection_version()
+                if version is not None:
+                    cache_key = SearchCache.make_key(
+                        version,
+                        query=query,
+                        limit=limit,
+                        score_threshold=score_threshold,
+                        compact=compact,
+                        max_chars=max_chars,
+                        max_tokens=max_tokens
+                    )
+                    cached = search_cache.get(cache_key)
+            # Sin token de versión la petición no usa la caché ni la rellena
+            bypass = version is None
+        if not bypass:
+            SEARCH_CACHE_LOOKUPS.labels(result="hit" if cached is not None else "miss").inc()
+            if cached is not None:
+                logger.info(f"⚡ Respuesta servida desde caché ({cached['total_results']} documentos)")
+                SEARCH_RESULTS.inc(cached['total_results'])
+                with timer.stage("serialization"):
+                    http_response = jsonify(cached)
+                http_response.headers['X-Search-Cache'] = 'HIT'
+                return finish(http_response, "ok")
+        else:
+            SEARCH_CACHE_LOOKUPS.labels(result="bypass").inc()
         
         # Obtener embedding de la consulta
-        query_embedding = get_embedding(query)
+        with timer.stage("embedding"):
+            query_embedding = get_embedding(query)
         
         # Buscar en Qdrant
-        search_results = qdrant_client.search(
-            collection_name=COLLECTION_NAME,
-            query_vector=query_embedding,
-            limit=limit,
-            score_threshold=score_threshold
-        )
-        
-        # Si no encuentra nada, buscar sin threshold
-        if not search_results:
-            logger.warning("⚠️ Sin resultados con threshold, buscando sin filtro...")
+        with timer.stage("qdrant"):
             search_results = qdrant_client.search(
                 collection_name=COLLECTION_NAME,
                 query_vector=query_embedding,
                 limit=limit,
-                score_threshold=0.0
+                score_threshold=score_threshold,
+                search_params=search_params
             )
         
+        # Si no encuentra nada, buscar sin threshold
+        if not search_results:
+            logger.warning("⚠️ Sin resultados con threshold, buscando sin filtro...")
+            SEARCH_FALLBACKS.inc()
+            with timer.stage("qdrant_fallback"):
+                search_results = qdrant_client.search(
+                    collection_name=COLLECTION_NAME,
+                    query_vector=query_embedding,
+                    limit=limit,
+                    score_threshold=0.0,
+                    search_params=search_params
+                )
+        
         # Procesar resultados
         documents = []
         for result in search_results:
@@ -128,26 +302,77 @@ def search():
             }
             documents.append(doc)
         
+        compaction_stats = None
+        if compact:
+            with timer.stage("compaction"):
+                compacted = compact_results(documents, max_chars=max_chars, max_tokens=max_tokens)
+            documents = compacted["results"]
+            compaction_stats = compacted["stats"]
+            logger.info(
+                f"🗜️ Compactación: {compaction_stats['input_results']} → {compaction_stats['output_results']} resultados, "
+                f"~{compaction_stats['input_tokens_estimate']} → ~{compaction_stats['output_tokens_estimate']} tokens"
+            )
+        
         response = {
             "query": query,
             "results": documents,
             "total_results": len(documents),
             "parameters": {
                 "limit": limit,
-                "score_threshold": score_threshold
+                "score_threshold": score_threshold,
+                "compact": compact,
+                "max_chars": max_chars,
+                "max_tokens": max_tokens
             }
         }
+        if compaction_stats:
+            response["compaction"] = compaction_stats
         
         logger.info(f"✅ Encontrados {len(documents)} documentos")
+        SEARCH_RESULTS.inc(len(documents))
+        if not documents:
+            SEARCH_EMPTY_RESULTS.inc()
         
-        return jsonify(response)
+        if cache_key is not None:
+            search_cache.put(cache_key, response)
+        
+        with timer.stage("serialization"):
+            http_response = jsonify(response)
+        http_response.headers['X-Search-Cache'] = 'BYPASS' if bypass else 'MISS'
+        return finish(http_response, "ok")
         
     except Exception as e:
         logger.error(f"❌ Error en búsqueda: {e}")
-        return jsonify({
+        return finish(make_response(jsonify({
             "error": "Error interno del servidor",
             "details": str(e)
-        }), 500
+        }), 500), "error")
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Métricas en formato Prometheus (etapas, fallbacks, resultados y caché)"""
+    return Response(generate_latest(), mimetype=CONTENT_TYPE_LATEST)
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    """Contadores de aciertos/fallos y ocupación de la caché de búsquedas"""
+    return jsonify({
+        **search_cache.stats(),
+        "collection_version": get_collection_version()
+    })
+
+@app.route('/cache/embeddings', methods=['GET'])
+def embedding_store_stats():
+    """Tamaño del almacén persistente de embeddings"""
+    if not embedding_store:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **embedding_store.stats()})
+
+@app.route('/cache', methods=['DELETE'])
+def cache_clear():
+    """Vaciar la caché de búsquedas"""
+    search_cache.clear()
+    return jsonify({"status": "cleared"})
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=8080, debug=True)
\ No newline at end of file
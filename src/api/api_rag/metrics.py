@@ -0,0 +1,73 @@
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+from prometheus_client import Counter, Histogram
+
+# Buckets pensados para llamadas locales a Ollama/Qdrant (de 1 ms a 30 s)
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+SEARCH_STAGE_SECONDS = Histogram(
+    "rag_search_stage_seconds",
+    "Duración de cada etapa de /search",
+    ["stage"],
+    buckets=STAGE_BUCKETS
+)
+SEARCH_REQUESTS = Counter(
+    "rag_search_requests_total",
+    "Peticiones a /search por resultado",
+    ["status"]
+)
+SEARCH_FALLBACKS = Counter(
+    "rag_search_fallback_total",
+    "Búsquedas repetidas sin umbral por no encontrar resultados"
+)
+SEARCH_RESULTS = Counter(
+    "rag_search_results_total",
+    "Documentos devueltos por /search"
+)
+SEARCH_EMPTY_RESULTS = Counter(
+    "rag_search_empty_results_total",
+    "Búsquedas que no devolvieron ningún documento"
+)
+SEARCH_CACHE_LOOKUPS = Counter(
+    "rag_search_cache_lookups_total",
+    "Consultas a la caché de respuestas",
+    ["result"]
+)
+
+EMBED_BATCH_SIZE = Histogram(
+    "rag_embedding_batch_size",
+    "Número de consultas agrupadas en cada llamada de embedding a Ollama",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128)
+)
+EMBED_BATCH_WAIT_SECONDS = Histogram(
+    "rag_embedding_batch_wait_seconds",
+    "Tiempo que una consulta espera en cola hasta que su lote se envía",
+    buckets=STAGE_BUCKETS
+)
+
+
+class StageTimer:
+    """
+    Cronometra las etapas de una petición: alimenta los histogramas de
+    Prometheus y genera la cabecera Server-Timing de la respuesta.
+    """
+
+    def __init__(self):
+        self.durations: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name: str, seconds: float):
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+        SEARCH_STAGE_SECONDS.labels(stage=name).observe(seconds)
+
+    def server_timing(self) -> str:
+        return ", ".join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in self.durations.items())
@@ -1,16 +1,70 @@
-from datetime import date, datetime, time
+from datetime import date, datetime, time, timedelta, timezone
+from time import sleep
+from typing import List, Optional
+import random
 
 from flask import Flask, request, jsonify, send_from_directory
-from pydantic import BaseModel, ValidationError
-from sqlalchemy import func
+from pydantic import BaseModel, Field, ValidationError, field_validator, model_validator
+from sqlalchemy import event, extract, func, insert, literal, select, true, tuple_, union_all, update
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import scoped_session, sessionmaker
 from flask_swagger_ui import get_swaggerui_blueprint
 import os
 
-from generator.main import get_session, Service, Slot, Booking
+from generator.main import DB_URL, init_db, AvailabilityVersion, Service, Slot, Booking
 
 
 app = Flask(__name__)
 
+SERVICES = ["gimnasio", "sauna"]
+# Límites de la rejilla de disponibilidad por rango
+GRID_MAX_DAYS = int(os.getenv("GRID_MAX_DAYS", 31))
+GRID_MAX_LIMIT = int(os.getenv("GRID_MAX_LIMIT", 1000))
+GRID_COLUMNS = ["slot_id", "service", "start_time", "total_capacity", "available_slots"]
+# Búsqueda de las franjas libres más cercanas a una hora (`nearest` en /availability)
+NEAREST_MAX = int(os.getenv("NEAREST_MAX", 10))
+NEAREST_WINDOW_DAYS = int(os.getenv("NEAREST_WINDOW_DAYS", 7))
+
+# Espera máxima por el bloqueo de una franja muy solicitada y reintentos antes de responder 503
+BOOKING_LOCK_TIMEOUT_MS = int(os.getenv("BOOKING_LOCK_TIMEOUT_MS", 2000))
+BOOKING_MAX_RETRIES = int(os.getenv("BOOKING_MAX_RETRIES", 3))
+BOOKING_RETRY_BACKOFF_MS = int(os.getenv("BOOKING_RETRY_BACKOFF_MS", 50))
+LOCK_NOT_AVAILABLE = "55P03"
+# Tamaño máximo de una reserva de grupo
+GROUP_MAX_GUESTS = int(os.getenv("GROUP_MAX_GUESTS", 20))
+GROUP_MAX_SLOTS = int(os.getenv("GROUP_MAX_SLOTS", 8))
+
+
+def apply_lock_timeout(target_engine):
+    """lock_timeout en cada conexión nueva de Postgres: ninguna reserva espera indefinidamente tras otra"""
+    if target_engine.dialect.name != "postgresql":
+        return
+
+    @event.listens_for(target_engine, "connect")
+    def set_lock_timeout(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"SET lock_timeout = {BOOKING_LOCK_TIMEOUT_MS}")
+        cursor.close()
+        # Sin commit el SET se desharía con el rollback al devolver la conexión al pool
+        dbapi_connection.commit()
+
+
+# Engine con pool compartido por todo el proceso; el esquema se crea una vez al arrancar
+engine = init_db(DB_URL)
+apply_lock_timeout(engine)
+# Las conexiones abiertas por las migraciones no tienen lock_timeout: se descartan
+engine.dispose()
+# Una sesión por hilo/petición, que se devuelve al pool al terminar la petición
+db_session = scoped_session(sessionmaker(bind=engine, expire_on_commit=False))
+# availability_versions sólo se mantiene con el trigger de Postgres
+ETAGS_ENABLED = engine.dialect.name == "postgresql"
+
+
+@app.teardown_appcontext
+def remove_session(exception=None):
+    db_session.remove()
+
+
 @app.route("/docs/openapi.yml")
 def openapi_spec():
     docs_dir = os.path.join(os.path.dirname(__file__), "docs")
@@ -31,19 +85,89 @@ swaggerui_blueprint = get_swaggerui_blueprint(
 app.register_blueprint(swaggerui_blueprint, url_prefix=SWAGGER_URL)
 
 
+def slot_to_dict(slot):
+    return {
+        "slot_id": slot.id,
+        "start_time": slot.start_time.isoformat(),
+        "total_capacity": slot.capacity,
+        "current_bookings": slot.booked_count,
+        "available_slots": slot.capacity - slot.booked_count,
+    }
+
+
+def naive_utc(value):
+    """Las franjas se guardan sin zona horaria: una hora con zona se pasa a UTC y se le quita la zona,
+    igual que hace Postgres al comparar un timestamptz con una columna timestamp."""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
 class BookingCreate(BaseModel):
     slot_id: int
     guest_name: str
 
 
-@app.route("/availability", methods=["POST"])
+class BookingByTime(BaseModel):
+    service_name: str
+    start_time: datetime
+    guest_name: str
+
+    @field_validator("start_time")
+    @classmethod
+    def normalize_start_time(cls, value):
+        return naive_utc(value)
+
+
+class GroupBooking(BaseModel):
+    service_name: str
+    start_times: List[datetime] = Field(min_length=1, max_length=GROUP_MAX_SLOTS)
+    guest_names: List[str] = Field(min_length=1, max_length=GROUP_MAX_GUESTS)
+
+    @field_validator("start_times")
+    @classmethod
+    def normalize_start_times(cls, values):
+        # Se comparan en Python con las horas de la base de datos, que no tienen zona
+        return [naive_utc(value) for value in values]
+
+
+class AvailabilityRange(BaseModel):
+    start_date: date
+    end_date: date
+    services: List[str] = Field(default_factory=lambda: list(SERVICES), min_length=1)
+    only_available: bool = False
+    limit: int = Field(200, ge=1, le=GRID_MAX_LIMIT)
+    cursor: Optional[str] = None
+
+    @model_validator(mode="after")
+    def check_range(self):
+        if self.end_date < self.start_date:
+            raise ValueError("'end_date' no puede ser anterior a 'start_date'")
+        if (self.end_date - self.start_date).days >= GRID_MAX_DAYS:
+            raise ValueError(f"El rango no puede superar {GRID_MAX_DAYS} días")
+        return self
+
+
+def parse_cursor(cursor):
+    """El cursor es la última fila devuelta: 'start_time|slot_id'"""
+    start_str, _, slot_id = cursor.partition("|")
+    return datetime.fromisoformat(start_str), int(slot_id)
+
+
+@app.route("/availability", methods=["GET", "POST"])
 def get_service_availability():
 
-    data = request.get_json(silent=True) or {}
+    if request.method == "GET":
+        # Mismos campos como parámetros de la URL; admite If-None-Match
+        data = request.args.to_dict()
+        if data.get("nearest", "").isdigit():
+            data["nearest"] = int(data["nearest"])
+    else:
+        data = request.get_json(silent=True) or {}
     service_name = data.get("service_name")
     start_str = data.get("start_time")
 
-    if service_name not in ["gimnasio", "sauna"]:
+    if service_name not in SERVICES:
         return (
             jsonify({"error": "Servicio no encontrado. Use 'gimnasio' o 'sauna'."}),
             404,
@@ -51,93 +175,196 @@ def get_service_availability():
     if not start_str:
         return jsonify({"error": "El campo 'start_time' es obligatorio."}), 400
 
-    session = get_session()
+    nearest = data.get("nearest")
+    if nearest is not None and (
+        type(nearest) is not int or not 1 <= nearest <= NEAREST_MAX or "T" not in start_str
+    ):
+        return (
+            jsonify(
+                {
+                    "error": f"'nearest' debe ser un entero entre 1 y {NEAREST_MAX} y 'start_time' una fecha con hora."
+                }
+            ),
+            400,
+        )
+
     try:
         if "T" in start_str:
-            try:
-                dt = datetime.fromisoformat(start_str)
-            except ValueError:
-                return (
-                    jsonify(
-                        {
-                            "error": "Formato inválido para 'start_time'. Use YYYY-MM-DD o YYYY-MM-DDThh:mm:ss"
-                        }
-                    ),
-                    400,
-                )
-
-            slot_with_count = (
-                session.query(Slot, func.count(Booking.id).label("bookings_count"))
-                .join(Service, Slot.service_id == Service.id)
-                .outerjoin(Booking, Booking.slot_id == Slot.id)
-                .filter(Service.name == service_name)
-                .filter(Slot.start_time == dt)
-                .group_by(Slot.id)
-                .first()
-            )
-            if not slot_with_count:
-                return jsonify([]), 200
-
-            slot, cnt = slot_with_count
-            available = slot.capacity - cnt
-            return (
-                jsonify(
-                    [
-                        {
-                            "slot_id": slot.id,
-                            "start_time": slot.start_time.isoformat(),
-                            "total_capacity": slot.capacity,
-                            "current_bookings": cnt,
-                            "available_slots": available,
-                        }
-                    ]
-                ),
-                200,
-            )
-
-        try:
+            dt = naive_utc(datetime.fromisoformat(start_str))
+            day = dt.date()
+        else:
             day = date.fromisoformat(start_str)
-        except ValueError:
-            return (
-                jsonify(
-                    {
-                        "error": "Formato inválido para 'start_time'. Use YYYY-MM-DD o YYYY-MM-DDThh:mm:ss"
-                    }
-                ),
-                400,
-            )
+    except ValueError:
+        return (
+            jsonify(
+                {
+                    "error": "Formato inválido para 'start_time'. Use YYYY-MM-DD o YYYY-MM-DDThh:mm:ss"
+                }
+            ),
+            400,
+        )
 
+    session = db_session()
+    etag = None
+    if request.method == "GET" and ETAGS_ENABLED:
+        window = timedelta(days=NEAREST_WINDOW_DAYS) if nearest else timedelta()
+        etag = availability_etag(session, service_name, day - window, day + window)
+        if nearest:
+            # Las franjas empiezan en punto: con cada hora que pasa puede quedar fuera una candidata
+            etag = f"{etag}:{datetime.now():%Y%m%d%H}"
+        if request.if_none_match.contains_weak(etag):
+            # Nada ha cambiado en esos días: ni consulta de disponibilidad ni cuerpo
+            response = app.response_class(status=304)
+            response.set_etag(etag)
+            return response
+
+    if nearest:
+        slots = nearest_available(session, service_name, dt, nearest)
+    elif "T" in start_str:
+        slots = (
+            session.query(Slot)
+            .join(Service, Slot.service_id == Service.id)
+            .filter(Service.name == service_name)
+            .filter(Slot.start_time == dt)
+            .limit(1)
+            .all()
+        )
+    else:
         start_of_day = datetime.combine(day, time(hour=8))
         end_of_day = datetime.combine(day, time(hour=21))
 
-        results = (
-            session.query(Slot, func.count(Booking.id).label("bookings_count"))
+        slots = (
+            session.query(Slot)
             .join(Service, Slot.service_id == Service.id)
-            .outerjoin(Booking, Booking.slot_id == Slot.id)
             .filter(Service.name == service_name)
             .filter(Slot.start_time >= start_of_day)
             .filter(Slot.start_time < end_of_day)
-            .group_by(Slot.id)
             .order_by(Slot.start_time)
             .limit(3)
             .all()
         )
 
-        availability = []
-        for slot, cnt in results:
-            availability.append(
-                {
-                    "slot_id": slot.id,
-                    "start_time": slot.start_time.isoformat(),
-                    "total_capacity": slot.capacity,
-                    "current_bookings": cnt,
-                    "available_slots": slot.capacity - cnt,
-                }
-            )
-        return jsonify(availability), 200
+    response = jsonify([slot_to_dict(slot) for slot in slots])
+    if etag:
+        response.set_etag(etag)
+    return response, 200
+
+
+def availability_etag(session, service_name, first_day, last_day):
+    """ETag de la disponibilidad de un servicio entre dos días, a partir de availability_versions.
+
+    Las versiones sólo crecen, así que su suma cambia con cualquier cambio en
+    esos días. Se lee antes que las franjas: si entre medias entra una
+    reserva, el cliente recibe datos más nuevos que la etiqueta y en la
+    siguiente revalidación simplemente los vuelve a descargar.
+    """
+    version = (
+        session.query(func.coalesce(func.sum(AvailabilityVersion.version), 0))
+        .join(Service, AvailabilityVersion.service_id == Service.id)
+        .filter(Service.name == service_name)
+        .filter(AvailabilityVersion.day.between(first_day, last_day))
+        .scalar()
+    )
+    return f"{service_name}:{first_day}:{last_day}:{version}"
+
+
+def nearest_available(session, service_name, target, k, now=None):
+    """Las `k` franjas con plazas libres más cercanas a `target`, de la más próxima a la más lejana.
+
+    Dos recorridos del índice (service_id, start_time), uno hacia delante y
+    otro hacia atrás desde `target`, aportan como mucho `k` candidatas cada
+    uno; de ellas se quedan las `k` a menor distancia. La ventana de
+    NEAREST_WINDOW_DAYS acota el recorrido cuando todo está completo, y
+    ninguno de los dos baja de `now`: una franja ya empezada no es una alternativa.
+    """
+    window = timedelta(days=NEAREST_WINDOW_DAYS)
+    now = now or datetime.now()
+    service_id = select(Service.id).where(Service.name == service_name).scalar_subquery()
+    free = select(Slot.id).where(Slot.service_id == service_id, Slot.booked_count < Slot.capacity)
+    after = (
+        free.where(Slot.start_time >= max(target, now), Slot.start_time < target + window)
+        .order_by(Slot.start_time)
+        .limit(k)
+        .subquery()
+    )
+    before = (
+        free.where(Slot.start_time < target, Slot.start_time >= max(target - window, now))
+        .order_by(Slot.start_time.desc())
+        .limit(k)
+        .subquery()
+    )
+    candidates = union_all(select(after.c.id), select(before.c.id)).subquery()
+    return (
+        session.query(Slot)
+        .filter(Slot.id.in_(select(candidates.c.id)))
+        .order_by(func.abs(extract("epoch", Slot.start_time - target)), Slot.start_time)
+        .limit(k)
+        .all()
+    )
+
+
+@app.route("/availability/range", methods=["POST"])
+def get_availability_grid():
+
+    json_data = request.get_json(silent=True)
+    if json_data is None:
+        return jsonify({"error": "Cuerpo de la petición debe ser JSON."}), 400
 
-    finally:
-        session.close()
+    try:
+        query_data = AvailabilityRange.model_validate(json_data)
+    except ValidationError as e:
+        return (
+            jsonify({"error": "Datos de entrada inválidos", "details": e.errors(include_context=False)}),
+            422,
+        )
+
+    unknown = sorted(set(query_data.services) - set(SERVICES))
+    if unknown:
+        return (
+            jsonify({"error": f"Servicio no encontrado: {', '.join(unknown)}. Use 'gimnasio' o 'sauna'."}),
+            404,
+        )
+
+    after = None
+    if query_data.cursor:
+        try:
+            after = parse_cursor(query_data.cursor)
+        except ValueError:
+            return jsonify({"error": "Cursor inválido."}), 400
+
+    # Una sola consulta por página: rango de start_time sobre slots, sin tocar bookings
+    query = (
+        db_session()
+        .query(Slot.id, Service.name, Slot.start_time, Slot.capacity, Slot.booked_count)
+        .join(Service, Slot.service_id == Service.id)
+        .filter(Service.name.in_(query_data.services))
+        .filter(Slot.start_time >= datetime.combine(query_data.start_date, time.min))
+        .filter(Slot.start_time < datetime.combine(query_data.end_date + timedelta(days=1), time.min))
+    )
+    if query_data.only_available:
+        query = query.filter(Slot.booked_count < Slot.capacity)
+    if after:
+        query = query.filter(tuple_(Slot.start_time, Slot.id) > tuple_(*after))
+    rows = query.order_by(Slot.start_time, Slot.id).limit(query_data.limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > query_data.limit:
+        rows = rows[: query_data.limit]
+        next_cursor = f"{rows[-1].start_time.isoformat()}|{rows[-1].id}"
+
+    return (
+        jsonify(
+            {
+                "columns": GRID_COLUMNS,
+                "rows": [
+                    [slot_id, name, start.isoformat(), capacity, capacity - booked]
+                    for slot_id, name, start, capacity, booked in rows
+                ],
+                "next_cursor": next_cursor,
+            }
+        ),
+        200,
+    )
 
 
 @app.route("/booking", methods=["POST"])
@@ -155,50 +382,298 @@ def create_booking():
             422,
         )
 
-    session = get_session()
     try:
-        slot_to_book = (
-            session.query(Slot)
-            .filter(Slot.id == booking_data.slot_id)
-            .with_for_update()
-            .first()
+        result = reserve(
+            reservation_statement(booking_data.guest_name, slot_id=booking_data.slot_id)
+        )
+    except SlotBusy:
+        return slot_busy_response()
+    except Exception as e:
+        return (
+            jsonify({"error": "Ha ocurrido un error interno.", "details": str(e)}),
+            500,
+        )
+
+    if result is None:
+        return jsonify({"error": "La franja horaria (slot) no existe."}), 404
+    if result.booking_id is None:
+        return (
+            jsonify({"error": "No hay huecos disponibles en esta franja horaria."}),
+            409,
+        )
+
+    response_data = {
+        "id": result.booking_id,
+        "slot_id": result.slot_id,
+        "guest_name": booking_data.guest_name,
+    }
+    return jsonify(response_data), 201
+
+
+class SlotBusy(Exception):
+    """La franja siguió bloqueada por otras reservas tras agotar los reintentos"""
+
+
+def reservation_statement(guest_name, slot_id=None, service_name=None, start_time=None):
+    """Reserva en una sola sentencia: localiza la franja (por id o por servicio y hora),
+    incrementa booked_count si queda plaza e inserta la reserva.
+
+    Devuelve una fila (slot_id, booking_id): sin filas si la franja no existe y
+    booking_id NULL si está completa. En Postgres el UPDATE bloquea la fila del
+    slot sólo durante esta sentencia y vuelve a evaluar `booked_count < capacity`
+    tras esperar a otra transacción, así que las reservas simultáneas nunca
+    superan la capacidad.
+    """
+    target = select(Slot.id)
+    if slot_id is not None:
+        target = target.where(Slot.id == slot_id)
+    else:
+        target = (
+            target.join(Service, Slot.service_id == Service.id)
+            .where(Service.name == service_name)
+            .where(Slot.start_time == start_time)
+            # Si hay varias franjas a la misma hora, primero las que tienen plaza
+            .order_by(Slot.booked_count >= Slot.capacity, Slot.id)
         )
+    target = target.limit(1).cte("target")
+    reserved = (
+        update(Slot)
+        .where(Slot.id == select(target.c.id).scalar_subquery())
+        .where(Slot.booked_count < Slot.capacity)
+        .values(booked_count=Slot.booked_count + 1)
+        .returning(Slot.id)
+        .cte("reserved")
+    )
+    inserted = (
+        insert(Booking)
+        .from_select(["slot_id", "guest_name"], select(reserved.c.id, literal(guest_name)))
+        .returning(Booking.id)
+        .cte("inserted")
+    )
+    return select(target.c.id.label("slot_id"), inserted.c.id.label("booking_id")).select_from(
+        target.outerjoin(inserted, true())
+    )
+
+
+def reserve(statement, bind=None):
+    """Ejecutar una reserva sin quedarse en cola indefinidamente tras una franja muy solicitada.
+
+    La sentencia va en autocommit: es atómica por sí sola y así el bloqueo de
+    la fila del slot se libera al terminarla, sin esperar a un COMMIT aparte.
+    Si vence `lock_timeout` se reintenta con backoff exponencial y jitter
+    hasta BOOKING_MAX_RETRIES veces y después se lanza SlotBusy.
+    """
+    with (bind or engine).connect() as connection:
+        connection = connection.execution_options(isolation_level="AUTOCOMMIT")
+        return retry_on_lock_timeout(lambda: connection.execute(statement).first())
+
+
+def retry_on_lock_timeout(operation):
+    """Reintentar `operation` con backoff exponencial y jitter mientras venza lock_timeout"""
+    for attempt in range(BOOKING_MAX_RETRIES + 1):
+        try:
+            return operation()
+        except OperationalError as e:
+            code = getattr(e.orig, "pgcode", None) or getattr(e.orig, "sqlstate", None)
+            if code != LOCK_NOT_AVAILABLE:
+                raise
+            if attempt == BOOKING_MAX_RETRIES:
+                raise SlotBusy() from e
+            sleep(BOOKING_RETRY_BACKOFF_MS / 1000 * 2 ** attempt * random.uniform(0.5, 1.5))
+
+
+def slot_busy_response():
+    response = jsonify(
+        {"error": "La franja está muy solicitada en este momento. Inténtelo de nuevo en unos segundos."}
+    )
+    response.headers["Retry-After"] = "1"
+    return response, 503
+
 
-        if not slot_to_book:
-            return jsonify({"error": "La franja horaria (slot) no existe."}), 404
+@app.route("/booking/by-time", methods=["POST"])
+def create_booking_by_time():
 
-        current_bookings = (
-            session.query(Booking).filter(Booking.slot_id == slot_to_book.id).count()
+    json_data = request.get_json(silent=True)
+    if not json_data:
+        return jsonify({"error": "Cuerpo de la petición debe ser JSON."}), 400
+
+    try:
+        booking_data = BookingByTime.model_validate(json_data)
+    except ValidationError as e:
+        return (
+            jsonify({"error": "Datos de entrada inválidos", "details": e.errors(include_context=False)}),
+            422,
         )
 
-        if current_bookings >= slot_to_book.capacity:
-            return (
-                jsonify({"error": "No hay huecos disponibles en esta franja horaria."}),
-                409,
-            )
+    if booking_data.service_name not in SERVICES:
+        return (
+            jsonify({"error": "Servicio no encontrado. Use 'gimnasio' o 'sauna'."}),
+            404,
+        )
 
-        new_booking = Booking(
-            slot_id=booking_data.slot_id, guest_name=booking_data.guest_name
+    try:
+        result = reserve(
+            reservation_statement(
+                booking_data.guest_name,
+                service_name=booking_data.service_name,
+                start_time=booking_data.start_time,
+            ),
+        )
+    except SlotBusy:
+        return slot_busy_response()
+    except Exception as e:
+        return (
+            jsonify({"error": "Ha ocurrido un error interno.", "details": str(e)}),
+            500,
         )
 
-        session.add(new_booking)
-        session.commit()
+    if result is None:
+        return jsonify({"error": "No existe ninguna franja horaria a esa hora."}), 404
+    if result.booking_id is None:
+        return (
+            jsonify({"error": "No hay huecos disponibles en esta franja horaria."}),
+            409,
+        )
+
+    return (
+        jsonify(
+            {
+                "id": result.booking_id,
+                "slot_id": result.slot_id,
+                "guest_name": booking_data.guest_name,
+                "service_name": booking_data.service_name,
+                "start_time": booking_data.start_time.isoformat(),
+            }
+        ),
+        201,
+    )
+
+
+class GroupRejected(Exception):
+    """El grupo no cabe: respuesta HTTP con el detalle de las franjas afectadas"""
+
+    def __init__(self, status, payload):
+        super().__init__(payload["error"])
+        self.status = status
+        self.payload = payload
+
+
+def book_group(session, service_name, start_times, guest_names):
+    """Reservar a todos los huéspedes en todas las franjas, o nada, en una sola transacción.
+
+    Una única consulta bloquea todas las franjas pedidas, en orden de id para
+    no provocar interbloqueos con otros grupos, y se comprueba la capacidad
+    de todas antes de insertar nada.
+    """
+    start_times = sorted(set(start_times))
+    needed = len(guest_names)
+    try:
+        slots = (
+            session.query(Slot)
+            .join(Service, Slot.service_id == Service.id)
+            .filter(Service.name == service_name)
+            .filter(Slot.start_time.in_(start_times))
+            .order_by(Slot.id)
+            .with_for_update(of=Slot)
+            .all()
+        )
+        chosen = {}
+        for slot in slots:
+            # Si hay varias franjas a la misma hora, la primera en la que quepa el grupo
+            current = chosen.get(slot.start_time)
+            if current is None or current.capacity - current.booked_count < needed <= slot.capacity - slot.booked_count:
+                chosen[slot.start_time] = slot
+
+        missing = [start.isoformat() for start in start_times if start not in chosen]
+        if missing:
+            raise GroupRejected(
+                404, {"error": "No existen franjas horarias a estas horas.", "missing": missing}
+            )
+        conflicts = [
+            {
+                "start_time": start.isoformat(),
+                "available_slots": slot.capacity - slot.booked_count,
+                "requested": needed,
+            }
+            for start, slot in chosen.items()
+            if slot.capacity - slot.booked_count < needed
+        ]
+        if conflicts:
+            raise GroupRejected(
+                409, {"error": "No hay plazas suficientes para todo el grupo.", "conflicts": conflicts}
+            )
 
-        response_data = {
-            "id": new_booking.id,
-            "slot_id": new_booking.slot_id,
-            "guest_name": new_booking.guest_name,
+        rows = session.execute(
+            insert(Booking).returning(
+                Booking.id, Booking.slot_id, Booking.guest_name, sort_by_parameter_order=True
+            ),
+            [
+                {"slot_id": chosen[start].id, "guest_name": guest_name}
+                for start in start_times
+                for guest_name in guest_names
+            ],
+        ).all()
+        session.execute(
+            update(Slot)
+            .where(Slot.id.in_([slot.id for slot in chosen.values()]))
+            .values(booked_count=Slot.booked_count + needed)
+        )
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+
+    start_by_slot = {slot.id: start for start, slot in chosen.items()}
+    return [
+        {
+            "id": row.id,
+            "slot_id": row.slot_id,
+            "start_time": start_by_slot[row.slot_id].isoformat(),
+            "guest_name": row.guest_name,
         }
-        return jsonify(response_data), 201
+        for row in rows
+    ]
+
+
+@app.route("/booking/group", methods=["POST"])
+def create_group_booking():
 
+    json_data = request.get_json(silent=True)
+    if not json_data:
+        return jsonify({"error": "Cuerpo de la petición debe ser JSON."}), 400
+
+    try:
+        booking_data = GroupBooking.model_validate(json_data)
+    except ValidationError as e:
+        return (
+            jsonify({"error": "Datos de entrada inválidos", "details": e.errors(include_context=False)}),
+            422,
+        )
+
+    if booking_data.service_name not in SERVICES:
+        return (
+            jsonify({"error": "Servicio no encontrado. Use 'gimnasio' o 'sauna'."}),
+            404,
+        )
+
+    session = db_session()
+    try:
+        bookings = retry_on_lock_timeout(
+            lambda: book_group(
+                session, booking_data.service_name, booking_data.start_times, booking_data.guest_names
+            )
+        )
+    except GroupRejected as e:
+        return jsonify(e.payload), e.status
+    except SlotBusy:
+        return slot_busy_response()
     except Exception as e:
-        session.rollback()
         return (
             jsonify({"error": "Ha ocurrido un error interno.", "details": str(e)}),
             500,
         )
-    finally:
-        session.close()
+
+    return jsonify({"service_name": booking_data.service_name, "bookings": bookings}), 201
 
 
 if __name__ == "__main__":
@@ -0,0 +1,152 @@
+"""
+Feed de cambios de disponibilidad con LISTEN/NOTIFY de Postgres.
+
+El trigger de slots (migración `add_availability_versions`) emite un NOTIFY
+en el canal `availability_changes` por cada franja que cambia (reservas,
+altas, bajas o cambios de capacidad). Postgres lo entrega al confirmarse la
+transacción, nunca antes, con un payload JSON:
+
+    {"service": "gimnasio", "slot_id": 42, "day": "2025-06-17",
+     "start_time": "2025-06-17T08:00:00", "version": 7}
+
+`version` es el contador de `availability_versions` de ese servicio y día
+tras el cambio (el que alimenta el ETag de `GET /availability`).
+
+`AvailabilitySubscriber` escucha el canal en un hilo de fondo con una
+conexión propia y llama a los callbacks registrados con cada cambio, para
+que el agente u otras réplicas de la API invaliden su caché al instante.
+Si la conexión se pierde se reconecta y llama a los callbacks de `on_reset`:
+los cambios de mientras no se han visto y hay que tratar toda la caché como
+desactualizada.
+
+Uso desde línea de comandos (imprime los cambios según llegan):
+    python changefeed.py [--database-url postgresql://...]
+"""
+import argparse
+import json
+import logging
+import os
+import select
+import threading
+
+import psycopg2
+from sqlalchemy.engine import make_url
+
+AVAILABILITY_CHANNEL = "availability_changes"
+
+logger = logging.getLogger(__name__)
+
+
+def libpq_dsn(database_url):
+    """URL de SQLAlchemy (con o sin driver, p. ej. `postgresql+psycopg://`) a DSN de libpq"""
+    url = make_url(database_url).set(drivername="postgresql")
+    return url.render_as_string(hide_password=False)
+
+
+class AvailabilitySubscriber:
+    """Escucha `availability_changes` y reparte cada cambio entre los callbacks registrados"""
+
+    def __init__(self, database_url, reconnect_delay=1.0, poll_timeout=5.0):
+        self.dsn = libpq_dsn(database_url)
+        self.reconnect_delay = reconnect_delay
+        self.poll_timeout = poll_timeout
+        self._callbacks = []
+        self._reset_callbacks = []
+        self._stop = threading.Event()
+        self._thread = None
+        self.connected = threading.Event()
+
+    def subscribe(self, callback):
+        """Registrar `callback(change)`; `change` es el payload decodificado. Sirve como decorador."""
+        self._callbacks.append(callback)
+        return callback
+
+    def on_reset(self, callback):
+        """Registrar `callback()` para cada (re)conexión, cuando puede haberse perdido algún cambio"""
+        self._reset_callbacks.append(callback)
+        return callback
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="availability-changefeed", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            connection = None
+            try:
+                # Keepalives: una conexión caída sin aviso se detecta en segundos, no con el timeout de TCP
+                connection = psycopg2.connect(self.dsn, keepalives=1, keepalives_idle=10,
+                                              keepalives_interval=5, keepalives_count=3)
+                connection.autocommit = True
+                with connection.cursor() as cursor:
+                    cursor.execute(f"LISTEN {AVAILABILITY_CHANNEL}")
+                logger.info(f"📡 Escuchando cambios de disponibilidad en '{AVAILABILITY_CHANNEL}'")
+                self.connected.set()
+                self._emit(self._reset_callbacks)
+                while not self._stop.is_set():
+                    if select.select([connection], [], [], self.poll_timeout) == ([], [], []):
+                        continue
+                    connection.poll()
+                    while connection.notifies:
+                        change = self._decode(connection.notifies.pop(0).payload)
+                        if change is not None:
+                            self._emit(self._callbacks, change)
+            except psycopg2.Error as e:
+                logger.warning(f"⚠️ Feed de disponibilidad desconectado: {e}. Reintentando en {self.reconnect_delay} s")
+            except Exception:
+                # Cualquier otro fallo tampoco puede dejar el feed parado: se reconecta y se avisa con on_reset
+                logger.exception(f"❌ Error en el feed de disponibilidad. Reintentando en {self.reconnect_delay} s")
+            finally:
+                self.connected.clear()
+                if connection is not None:
+                    connection.close()
+            self._stop.wait(self.reconnect_delay)
+
+    @staticmethod
+    def _decode(payload):
+        """Payload JSON de un NOTIFY; None (y un aviso) si no es un cambio válido, p. ej. un NOTIFY manual"""
+        try:
+            change = json.loads(payload)
+        except ValueError:
+            change = None
+        if not isinstance(change, dict):
+            logger.warning(f"⚠️ NOTIFY ignorado en '{AVAILABILITY_CHANNEL}': payload no válido {payload!r}")
+            return None
+        return change
+
+    @staticmethod
+    def _emit(callbacks, *args):
+        for callback in callbacks:
+            try:
+                callback(*args)
+            except Exception:
+                logger.exception("❌ Error en un callback del feed de disponibilidad")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Imprimir los cambios de disponibilidad según llegan")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    args = parser.parse_args()
+    if not args.database_url:
+        parser.error("hace falta DATABASE_URL o --database-url")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    subscriber = AvailabilitySubscriber(args.database_url)
+    subscriber.subscribe(lambda change: print(json.dumps(change, ensure_ascii=False), flush=True))
+    subscriber.start()
+    try:
+        subscriber._thread.join()
+    except KeyboardInterrupt:
+        subscriber.stop()
+
+
+if __name__ == "__main__":
+    main()
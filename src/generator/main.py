@@ -1,19 +1,28 @@
 import os
 import random
+import threading
 from datetime import datetime, timedelta
 from collections import defaultdict
 
 from faker import Faker
 from sqlalchemy import (
     Column,
+    BigInteger,
     Integer,
     String,
+    Date,
     DateTime,
     ForeignKey,
+    Index,
     create_engine,
 )
 from sqlalchemy.orm import declarative_base, relationship, sessionmaker
 
+try:
+    from generator.migrations import backfill_booked_count, run_migrations
+except ImportError:  # Ejecutado como script dentro de src/generator
+    from migrations import backfill_booked_count, run_migrations
+
 DB_URL = os.getenv("DATABASE_URL")
 TOTAL_GUESTS = os.getenv("TOTAL_GUESTS")
 if TOTAL_GUESTS is not None:
@@ -27,6 +36,12 @@ if TOTAL_GUESTS is not None:
 MAX_FILL_RATE = float(os.getenv("MAX_FILL_RATE", 0.5))
 FULL_DAY_PROB = float(os.getenv("FULL_DAY_PROB", 0.2))
 
+# Pool de conexiones del engine compartido (la API atiende peticiones en varios hilos)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 5))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+
 Base = declarative_base()
 fake = Faker(
     [
@@ -59,12 +74,17 @@ class Slot(Base):
     service_id = Column(Integer, ForeignKey("services.id"), nullable=False)
     start_time = Column(DateTime, nullable=False)
     capacity = Column(Integer, nullable=False)
+    # Reservas del slot, mantenido en la misma transacción que cada reserva
+    booked_count = Column(Integer, nullable=False, default=0, server_default="0")
 
     service = relationship("Service", back_populates="slots")
     bookings = relationship(
         "Booking", back_populates="slot", cascade="all, delete-orphan"
     )
 
+    # Disponibilidad y reservas por hora: rango de start_time dentro de un servicio
+    __table_args__ = (Index("ix_slots_service_id_start_time", "service_id", "start_time"),)
+
 
 class Booking(Base):
     __tablename__ = "bookings"
@@ -74,11 +94,58 @@ class Booking(Base):
 
     slot = relationship("Slot", back_populates="bookings")
 
+    # Recuentos por slot (comprobación de booked_count) y borrados en cascada
+    __table_args__ = (Index("ix_bookings_slot_id", "slot_id"),)
+
+
+class AvailabilityVersion(Base):
+    """Contador de cambios de las franjas de un servicio en un día (ETag de /availability).
+
+    Lo incrementa un trigger de Postgres sobre slots (migración
+    `add_availability_versions`); un día sin fila equivale a la versión 0.
+    """
+    __tablename__ = "availability_versions"
+    service_id = Column(Integer, ForeignKey("services.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0, server_default="0")
+
+
+_engines = {}
+_initialized = set()
+_engines_lock = threading.Lock()
+
+
+def get_engine(db_url: str = DB_URL):
+    """Engine único por proceso y URL: reutiliza las conexiones del pool entre peticiones"""
+    with _engines_lock:
+        engine = _engines.get(db_url)
+        if engine is None:
+            options = {}
+            if not db_url.startswith("sqlite"):
+                options = {
+                    "pool_size": DB_POOL_SIZE,
+                    "max_overflow": DB_MAX_OVERFLOW,
+                    "pool_timeout": DB_POOL_TIMEOUT,
+                    "pool_recycle": DB_POOL_RECYCLE,
+                }
+            engine = create_engine(db_url, echo=False, future=True, pool_pre_ping=True, **options)
+            _engines[db_url] = engine
+        return engine
+
+
+def init_db(db_url: str = DB_URL):
+    """Crear el esquema una sola vez por proceso y devolver el engine compartido"""
+    engine = get_engine(db_url)
+    with _engines_lock:
+        if db_url not in _initialized:
+            Base.metadata.create_all(engine)
+            run_migrations(engine)
+            _initialized.add(db_url)
+    return engine
+
 
 def get_session(db_url: str = DB_URL):
-    engine = create_engine(db_url, echo=False, future=True)
-    Base.metadata.create_all(engine)
-    return sessionmaker(bind=engine, expire_on_commit=False)()
+    return sessionmaker(bind=init_db(db_url), expire_on_commit=False)()
 
 
 def generate_services(session):
@@ -118,12 +185,14 @@ def generate_bookings(session):
 
     if TOTAL_GUESTS is not None:
         bookings = []
+        booked = {slot.id: slot.booked_count for slot in slots}
         for _ in range(TOTAL_GUESTS):
             slot = random.choice(slots)
-            current = session.query(Booking).filter_by(slot_id=slot.id).count()
-            if current < slot.capacity:
+            if booked[slot.id] < slot.capacity:
+                booked[slot.id] += 1
                 bookings.append(Booking(slot_id=slot.id, guest_name=fake.name()))
         session.bulk_save_objects(bookings)
+        backfill_booked_count(session.connection())
         session.commit()
         print(
             f"Generadas {len(bookings)} reservas totales especificadas (TOTAL_GUESTS={TOTAL_GUESTS})."
@@ -148,6 +217,7 @@ def generate_bookings(session):
                 bookings.append(Booking(slot_id=slot.id, guest_name=fake.name()))
 
     session.bulk_save_objects(bookings)
+    backfill_booked_count(session.connection())
     session.commit()
     print(
         f"Generadas {len(bookings)} reservas de prueba con llenado diario basado en probabilidades."
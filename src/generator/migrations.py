@@ -0,0 +1,201 @@
+"""
+Migraciones idempotentes del esquema de servicios.
+
+`Base.metadata.create_all` sólo crea tablas nuevas: las columnas e índices
+añadidos después a una tabla existente se aplican aquí. Cada migración
+comprueba el estado actual antes de tocar nada, así que se pueden ejecutar
+en cada arranque (lo hace `init_db`).
+
+Uso desde línea de comandos:
+    python migrations.py migrate          # aplicar migraciones pendientes
+    python migrations.py check            # comparar booked_count con bookings
+    python migrations.py check --repair   # y corregir las diferencias
+"""
+import argparse
+import os
+import sys
+
+from sqlalchemy import create_engine, inspect, text
+
+try:
+    from generator.changefeed import AVAILABILITY_CHANNEL
+except ImportError:  # Ejecutado como script dentro de src/generator
+    from changefeed import AVAILABILITY_CHANNEL
+
+
+def backfill_booked_count(connection, slot_ids=None):
+    """Recalcular `slots.booked_count` a partir de la tabla bookings"""
+    sql = """
+        UPDATE slots SET booked_count = (
+            SELECT COUNT(*) FROM bookings WHERE bookings.slot_id = slots.id
+        )
+    """
+    if slot_ids is None:
+        return connection.execute(text(sql)).rowcount
+    updated = 0
+    for slot_id in slot_ids:
+        updated += connection.execute(text(sql + " WHERE id = :slot_id"), {"slot_id": slot_id}).rowcount
+    return updated
+
+
+def add_booked_count(connection):
+    """Contador desnormalizado de reservas por slot"""
+    columns = {column["name"] for column in inspect(connection).get_columns("slots")}
+    if "booked_count" in columns:
+        return False
+    connection.execute(text("ALTER TABLE slots ADD COLUMN booked_count INTEGER NOT NULL DEFAULT 0"))
+    backfill_booked_count(connection)
+    return True
+
+
+INDEXES = {
+    "ix_slots_service_id_start_time": ("slots", ("service_id", "start_time")),
+    "ix_bookings_slot_id": ("bookings", ("slot_id",)),
+}
+
+
+def add_indexes(connection):
+    """Índices compuestos de las consultas de disponibilidad y reservas"""
+    inspector = inspect(connection)
+    created = False
+    for name, (table, columns) in INDEXES.items():
+        if name in {index["name"] for index in inspector.get_indexes(table)}:
+            continue
+        connection.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"))
+        created = True
+    return created
+
+
+def drop_indexes(connection):
+    """Sólo para comparar planes sin índices (benchmarks/query_plans.py)"""
+    for name in INDEXES:
+        connection.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+
+# Incrementa el contador del servicio y día de cada franja afectada y lo notifica
+# (al confirmarse la transacción) a los suscriptores de changefeed.py
+AVAILABILITY_VERSION_FUNCTION = """
+DECLARE
+    affected slots[] := '{}';
+    changed slots;
+    new_version BIGINT;
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        affected := affected || OLD;
+    END IF;
+    IF TG_OP = 'INSERT' OR (TG_OP = 'UPDATE' AND (NEW.service_id, NEW.start_time::date)
+                                                IS DISTINCT FROM (OLD.service_id, OLD.start_time::date)) THEN
+        affected := affected || NEW;
+    ELSIF TG_OP = 'UPDATE' THEN
+        -- Mismo servicio y día: un solo incremento, pero se notifica la franja ya actualizada
+        affected := ARRAY[NEW];
+    END IF;
+    FOREACH changed IN ARRAY affected LOOP
+        INSERT INTO availability_versions (service_id, day, version)
+        VALUES (changed.service_id, changed.start_time::date, 1)
+        ON CONFLICT (service_id, day) DO UPDATE SET version = availability_versions.version + 1
+        RETURNING version INTO new_version;
+        PERFORM pg_notify('""" + AVAILABILITY_CHANNEL + """', json_build_object(
+            'service', (SELECT name FROM services WHERE id = changed.service_id),
+            'slot_id', changed.id,
+            'day', changed.start_time::date,
+            'start_time', changed.start_time,
+            'version', new_version
+        )::text);
+    END LOOP;
+    RETURN NULL;
+END
+"""
+
+AVAILABILITY_VERSION_TRIGGERS = {
+    "slots_availability_version_rows": "AFTER INSERT OR DELETE ON slots FOR EACH ROW",
+    # Las actualizaciones que no cambian nada (p. ej. un backfill) no invalidan cachés
+    "slots_availability_version_update": (
+        "AFTER UPDATE OF service_id, start_time, capacity, booked_count ON slots FOR EACH ROW "
+        "WHEN ((OLD.service_id, OLD.start_time, OLD.capacity, OLD.booked_count) "
+        "IS DISTINCT FROM (NEW.service_id, NEW.start_time, NEW.capacity, NEW.booked_count))"
+    ),
+}
+
+
+def add_availability_versions(connection):
+    """Trigger que incrementa availability_versions y emite NOTIFY con cada cambio en slots (sólo Postgres)"""
+    if connection.dialect.name != "postgresql":
+        return False
+    current = connection.execute(
+        text("SELECT prosrc FROM pg_proc WHERE proname = 'bump_availability_version'")
+    ).scalar()
+    changed = current != AVAILABILITY_VERSION_FUNCTION
+    if changed:
+        connection.execute(text(
+            "CREATE OR REPLACE FUNCTION bump_availability_version() RETURNS trigger "
+            "LANGUAGE plpgsql AS $body$" + AVAILABILITY_VERSION_FUNCTION + "$body$"
+        ))
+    existing = set(connection.execute(text(
+        "SELECT tgname FROM pg_trigger WHERE tgrelid = 'slots'::regclass AND NOT tgisinternal"
+    )).scalars())
+    for name, definition in AVAILABILITY_VERSION_TRIGGERS.items():
+        if name not in existing:
+            connection.execute(text(
+                f"CREATE TRIGGER {name} {definition} EXECUTE FUNCTION bump_availability_version()"
+            ))
+            changed = True
+    return changed
+
+
+MIGRATIONS = [add_booked_count, add_indexes, add_availability_versions]
+
+
+def run_migrations(engine):
+    applied = []
+    with engine.begin() as connection:
+        for migration in MIGRATIONS:
+            if migration(connection):
+                applied.append(migration.__name__)
+    if applied:
+        print(f"Migraciones aplicadas: {applied}")
+    return applied
+
+
+def check_booked_count(connection):
+    """Slots cuyo booked_count no coincide con las reservas reales: (slot_id, booked_count, reservas)"""
+    rows = connection.execute(text("""
+        SELECT slots.id, slots.booked_count, COUNT(bookings.id) AS actual
+        FROM slots LEFT JOIN bookings ON bookings.slot_id = slots.id
+        GROUP BY slots.id, slots.booked_count
+        HAVING slots.booked_count <> COUNT(bookings.id)
+        ORDER BY slots.id
+    """))
+    return [tuple(row) for row in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migraciones y comprobaciones del esquema de servicios")
+    parser.add_argument("command", choices=["migrate", "check"])
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--repair", action="store_true", help="Recalcular los contadores inconsistentes")
+    args = parser.parse_args()
+    if not args.database_url:
+        parser.error("hace falta DATABASE_URL o --database-url")
+
+    engine = create_engine(args.database_url, future=True)
+    if args.command == "migrate":
+        run_migrations(engine)
+        return
+
+    with engine.begin() as connection:
+        mismatches = check_booked_count(connection)
+        for slot_id, booked_count, actual in mismatches:
+            print(f"Slot {slot_id}: booked_count={booked_count}, reservas={actual}")
+        if not mismatches:
+            print("booked_count es consistente con la tabla bookings.")
+            return
+        if args.repair:
+            backfill_booked_count(connection, [slot_id for slot_id, _, _ in mismatches])
+            print(f"Corregidos {len(mismatches)} slots.")
+    if not args.repair:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
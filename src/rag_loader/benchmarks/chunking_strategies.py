@@ -0,0 +1,102 @@
+"""
+Benchmark de chunking: chunker original frente al estructural.
+
+Para cada estrategia trocea los documentos incluidos, embebe todos los
+chunks con Ollama y resuelve las preguntas de `golden_queries.json` con
+búsqueda exacta por coseno (sin Qdrant, para aislar el efecto del chunking):
+
+* número de chunks y tokens estimados (total y máximo por chunk)
+* tiempo de embedding del corpus
+* hit rate top-3: la respuesta esperada aparece en alguno de los 3 primeros chunks
+* tokens de contexto que recibiría el agente con esos 3 chunks
+
+Uso:
+    python benchmarks/chunking_strategies.py [--sizes 150,250,400] [--overlap-ratio 0.2] [--k 3]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from chunking import StructuredChunker, count_tokens  # noqa: E402
+from main import DocumentProcessor  # noqa: E402
+
+DOCUMENTS_DIR = Path(__file__).resolve().parent.parent / "documents"
+GOLDEN_QUERIES = Path(__file__).with_name("golden_queries.json")
+
+
+def normalize(text: str) -> str:
+    # Los documentos usan espacios finos (U+202F) y saltos de línea dentro de las frases
+    return " ".join(text.split())
+
+
+def embed(ollama_url: str, model: str, texts, batch_size: int = 32):
+    embeddings = []
+    for start in range(0, len(texts), batch_size):
+        response = requests.post(f"{ollama_url}/api/embed",
+                                 json={"model": model, "input": texts[start:start + batch_size]}, timeout=300)
+        response.raise_for_status()
+        embeddings.extend(response.json()["embeddings"])
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+
+def load_texts():
+    texts = []
+    for path in sorted(DOCUMENTS_DIR.glob("*.txt")):
+        texts.append(DocumentProcessor._extract_text_from_txt(path))
+    for path in sorted(DOCUMENTS_DIR.glob("*.pdf")):
+        texts.append(DocumentProcessor._extract_text_from_pdf(path))
+    return [text for text in texts if text]
+
+
+def evaluate(label, chunks, queries, query_vectors, args):
+    start = time.perf_counter()
+    chunk_vectors = embed(args.ollama_url, args.model, chunks)
+    embed_seconds = time.perf_counter() - start
+
+    hits, context_tokens = 0, 0
+    normalized = [normalize(chunk) for chunk in chunks]
+    for query, vector in zip(queries, query_vectors):
+        top = np.argsort(-(chunk_vectors @ vector))[:args.k]
+        expected = normalize(query["expected"])
+        hits += any(expected in normalized[i] for i in top)
+        context_tokens += sum(count_tokens(chunks[i]) for i in top)
+
+    tokens = [count_tokens(chunk) for chunk in chunks]
+    print(f"{label:<22} {len(chunks):>7} {sum(tokens):>8} {max(tokens):>6} {embed_seconds:>9.2f} "
+          f"{hits / len(queries):>8.0%} {context_tokens / len(queries):>11.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ollama-url", default=f"http://{os.getenv('OLLAMA_HOST', 'localhost')}:"
+                                                f"{os.getenv('OLLAMA_PORT', '11434')}")
+    parser.add_argument("--model", default=os.getenv("EMBEDDING_MODEL", "nomic-embed-text:latest"))
+    parser.add_argument("--sizes", default="150,250,400", help="Presupuestos en tokens del chunker estructural")
+    parser.add_argument("--overlap-ratio", type=float, default=0.2)
+    parser.add_argument("--k", type=int, default=3)
+    args = parser.parse_args()
+
+    texts = load_texts()
+    queries = json.loads(GOLDEN_QUERIES.read_text(encoding="utf-8"))
+    query_vectors = embed(args.ollama_url, args.model, [query["query"] for query in queries])
+
+    print(f"{'estrategia':<22} {'chunks':>7} {'tokens':>8} {'máx':>6} {'embed s':>9} "
+          f"{f'hit@{args.k}':>8} {'ctx tokens':>11}")
+    fixed = [chunk for text in texts for chunk in DocumentProcessor._chunk_text(text)]
+    evaluate("fixed (1000/200 car.)", fixed, queries, query_vectors, args)
+    for size in [int(s) for s in args.sizes.split(",")]:
+        chunker = StructuredChunker(max_tokens=size, overlap_tokens=int(size * args.overlap_ratio))
+        structured = [chunk for text in texts for chunk in chunker.split(text)]
+        evaluate(f"structured ({size} tok)", structured, queries, query_vectors, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Benchmark de perfiles de colección de Qdrant.
+
+Copia los puntos de una colección existente (la que llena el rag_loader) a
+una colección temporal por perfil, ejecuta el conjunto de preguntas de
+referencia y compara cada perfil con una búsqueda exacta:
+
+* recall@k frente a la búsqueda exacta (sin HNSW ni cuantización)
+* latencia p50/p99 de la búsqueda
+* memoria estimada de vectores e índice (RAM y disco)
+
+El corpus incluido es pequeño, así que `--synthetic N` añade N vectores
+aleatorios normalizados para que el grafo HNSW tenga un tamaño realista.
+
+Uso:
+    python benchmarks/index_profiles.py [--collection documents] [--k 5] [--repeats 20] [--synthetic 50000]
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from pathlib import Path
+
+import requests
+from qdrant_client import QdrantClient
+from qdrant_client.models import Distance, PointStruct, SearchParams, QuantizationSearchParams, VectorParams
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import profiles  # noqa: E402
+
+GOLDEN_QUERIES = Path(__file__).with_name("golden_queries.json")
+
+
+def embed(ollama_url: str, model: str, texts):
+    response = requests.post(f"{ollama_url}/api/embed", json={"model": model, "input": texts}, timeout=120)
+    response.raise_for_status()
+    return response.json()["embeddings"]
+
+
+def load_points(client: QdrantClient, collection: str):
+    points, offset = [], None
+    while True:
+        batch, offset = client.scroll(
+            collection_name=collection, limit=256, offset=offset, with_payload=True, with_vectors=True
+        )
+        points.extend(batch)
+        if offset is None:
+            return points
+
+
+def synthetic_points(count: int, dim: int, seed: int = 42):
+    rng = random.Random(seed)
+    for _ in range(count):
+        vector = [rng.gauss(0, 1) for _ in range(dim)]
+        norm = sum(v * v for v in vector) ** 0.5
+        yield PointStruct(id=str(uuid.uuid4()), vector=[v / norm for v in vector], payload={"synthetic": True})
+
+
+def wait_until_indexed(client: QdrantClient, collection: str, timeout: float = 600):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        info = client.get_collection(collection)
+        if str(info.status).lower().endswith("green"):
+            return info
+        time.sleep(1)
+    raise TimeoutError(f"La colección {collection} no terminó de indexar")
+
+
+def estimate_memory(profile, points: int, dim: int):
+    """Estimación de memoria: vectores float32, copia int8 y enlaces del grafo HNSW"""
+    float_bytes = points * dim * 4
+    int8_bytes = points * dim if profile.get("quantization") else 0
+    m = profile["hnsw_m"] or 16
+    graph_bytes = points * m * 2 * 4
+    ram = graph_bytes + int8_bytes + (0 if profile["on_disk"] else float_bytes)
+    disk = float_bytes + int8_bytes + graph_bytes
+    return ram, disk
+
+
+def create_profile_collection(client, name, profile, dim):
+    client.recreate_collection(
+        collection_name=name,
+        vectors_config=VectorParams(size=dim, distance=Distance.COSINE, on_disk=profile["on_disk"] or None),
+        hnsw_config=profiles.hnsw_config(profile),
+        quantization_config=profiles.quantization_config(profile),
+    )
+
+
+def upload(client, name, points, batch_size=256):
+    batch = []
+    for point in points:
+        batch.append(point)
+        if len(batch) >= batch_size:
+            client.upsert(collection_name=name, points=batch, wait=True)
+            batch = []
+    if batch:
+        client.upsert(collection_name=name, points=batch, wait=True)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--qdrant-host", default=os.getenv("QDRANT_HOST", "localhost"))
+    parser.add_argument("--qdrant-port", type=int, default=int(os.getenv("QDRANT_PORT", "6333")))
+    parser.add_argument("--ollama-url", default=f"http://{os.getenv('OLLAMA_HOST', 'localhost')}:{os.getenv('OLLAMA_PORT', '11434')}")
+    parser.add_argument("--model", default=os.getenv("EMBEDDING_MODEL", "nomic-embed-text:latest"))
+    parser.add_argument("--collection", default=os.getenv("COLLECTION_NAME", "documents"))
+    parser.add_argument("--profiles", default=",".join(profiles.COLLECTION_PROFILES))
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--synthetic", type=int, default=0)
+    parser.add_argument("--keep", action="store_true", help="No borrar las colecciones temporales")
+    args = parser.parse_args()
+
+    client = QdrantClient(host=args.qdrant_host, port=args.qdrant_port, timeout=120)
+    source_points = load_points(client, args.collection)
+    if not source_points:
+        print(f"❌ La colección '{args.collection}' está vacía. Ejecuta antes el rag_loader.")
+        sys.exit(1)
+    dim = len(source_points[0].vector)
+    points = [PointStruct(id=p.id, vector=p.vector, payload=p.payload) for p in source_points]
+    points.extend(synthetic_points(args.synthetic, dim))
+    total_points = len(points)
+
+    queries = [item["query"] for item in json.loads(GOLDEN_QUERIES.read_text(encoding="utf-8"))]
+    query_vectors = embed(args.ollama_url, args.model, queries)
+    print(f"📊 {total_points} puntos (dim={dim}), {len(queries)} consultas, k={args.k}\n")
+
+    exact_params = SearchParams(exact=True, quantization=QuantizationSearchParams(ignore=True))
+    rows = []
+    for name in args.profiles.split(","):
+        profile = profiles.get_profile(name)
+        collection = f"bench_profile_{name}"
+        create_profile_collection(client, collection, profile, dim)
+        upload(client, collection, points)
+        wait_until_indexed(client, collection)
+
+        params = profiles.search_params(profile)
+        recalls, latencies = [], []
+        for vector in query_vectors:
+            truth = client.search(collection_name=collection, query_vector=vector, limit=args.k, search_params=exact_params)
+            truth_ids = {hit.id for hit in truth}
+            for _ in range(args.repeats):
+                start = time.perf_counter()
+                hits = client.search(collection_name=collection, query_vector=vector, limit=args.k, search_params=params)
+                latencies.append((time.perf_counter() - start) * 1000)
+            recalls.append(len(truth_ids & {hit.id for hit in hits}) / max(1, len(truth_ids)))
+
+        ram, disk = estimate_memory(profile, total_points, dim)
+        rows.append((profiles.describe(name), statistics.mean(recalls), percentile(latencies, 50),
+                     percentile(latencies, 99), ram, disk))
+        if not args.keep:
+            client.delete_collection(collection)
+
+    print(f"{'perfil':<70} {'recall@k':>9} {'p50 ms':>8} {'p99 ms':>8} {'RAM MiB':>9} {'disco MiB':>10}")
+    for description, recall, p50, p99, ram, disk in rows:
+        print(f"{description:<70} {recall:>9.3f} {p50:>8.2f} {p99:>8.2f} {ram / 2**20:>9.1f} {disk / 2**20:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
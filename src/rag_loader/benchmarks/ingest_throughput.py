@@ -0,0 +1,99 @@
+"""
+Benchmark de ingesta: chunks por segundo con y sin embeddings por lotes.
+
+Procesa con `DocumentProcessor` los documentos incluidos y un corpus
+sintético (por defecto ~10k chunks) en una colección temporal, una vez por
+cada tamaño de lote indicado. El tamaño 1 equivale al comportamiento
+original (una petición HTTP por chunk).
+
+Uso:
+    python benchmarks/ingest_throughput.py [--batch-sizes 1,32] [--synthetic-chunks 10000]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from main import DocumentProcessor  # noqa: E402
+
+DOCUMENTS_DIR = Path(__file__).resolve().parent.parent / "documents"
+# Avance medio del chunker actual: 1000 caracteres menos 200 de solapamiento
+CHARS_PER_CHUNK = 800
+
+
+def build_synthetic_corpus(target_dir: Path, chunks: int, seed: int = 7) -> Path:
+    """Generar un .txt con vocabulario de los documentos reales y ~`chunks` chunks"""
+    source = " ".join(path.read_text(encoding="utf-8") for path in DOCUMENTS_DIR.glob("*.txt"))
+    words = re.findall(r"\w+", source) or ["hotel"]
+    rng = random.Random(seed)
+    target_chars = chunks * CHARS_PER_CHUNK
+    path = target_dir / "corpus_sintetico.txt"
+    written = 0
+    with open(path, "w", encoding="utf-8") as file:
+        while written < target_chars:
+            sentence = " ".join(rng.choice(words) for _ in range(rng.randint(8, 20))).capitalize() + ". "
+            if rng.random() < 0.1:
+                sentence += "\n\n"
+            file.write(sentence)
+            written += len(sentence)
+    return target_dir
+
+
+def run(processor: DocumentProcessor, folder: Path):
+    files = sorted(folder.glob("*.txt")) + sorted(folder.glob("*.pdf"))
+    chunks = sum(len(processor._chunk_text(processor._extract_text_from_txt(f) if f.suffix == ".txt"
+                                            else processor._extract_text_from_pdf(f))) for f in files)
+    start = time.perf_counter()
+    for file_path in files:
+        processor.process_document(file_path)
+    elapsed = time.perf_counter() - start
+    return chunks, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--qdrant-host", default=os.getenv("QDRANT_HOST", "localhost"))
+    parser.add_argument("--qdrant-port", type=int, default=int(os.getenv("QDRANT_PORT", "6333")))
+    parser.add_argument("--ollama-host", default=os.getenv("OLLAMA_HOST", "localhost"))
+    parser.add_argument("--ollama-port", type=int, default=int(os.getenv("OLLAMA_PORT", "11434")))
+    parser.add_argument("--model", default=os.getenv("EMBEDDING_MODEL", "nomic-embed-text:latest"))
+    parser.add_argument("--batch-sizes", default="1,32")
+    parser.add_argument("--synthetic-chunks", type=int, default=10000)
+    args = parser.parse_args()
+
+    import logging
+    logging.getLogger().setLevel(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        corpora = [("documentos incluidos", DOCUMENTS_DIR)]
+        if args.synthetic_chunks:
+            corpora.append((f"sintético (~{args.synthetic_chunks} chunks)",
+                            build_synthetic_corpus(Path(tmp), args.synthetic_chunks)))
+
+        print(f"{'corpus':<32} {'lote':>6} {'chunks':>8} {'segundos':>10} {'chunks/s':>10}")
+        for label, folder in corpora:
+            for batch_size in [int(b) for b in args.batch_sizes.split(",")]:
+                collection = f"bench_ingest_b{batch_size}"
+                processor = DocumentProcessor(
+                    qdrant_host=args.qdrant_host,
+                    qdrant_port=args.qdrant_port,
+                    ollama_host=args.ollama_host,
+                    ollama_port=args.ollama_port,
+                    collection_name=collection,
+                    embedding_model=args.model,
+                    embedding_batch_size=batch_size
+                )
+                try:
+                    chunks, elapsed = run(processor, folder)
+                finally:
+                    processor.qdrant_client.delete_collection(collection)
+                print(f"{label:<32} {batch_size:>6} {chunks:>8} {elapsed:>10.2f} {chunks / elapsed:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
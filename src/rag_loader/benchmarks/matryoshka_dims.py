@@ -0,0 +1,114 @@
+"""
+Benchmark de reducción de dimensión Matryoshka.
+
+Copia los puntos de una colección a dimensión completa (la que llena el
+rag_loader con EMBEDDING_DIM=0) a una colección temporal por dimensión,
+truncando y renormalizando los vectores igual que `matryoshka.reduce_dimension`,
+y compara cada una con la búsqueda exacta a dimensión completa:
+
+* recall@k frente a los k resultados exactos con la dimensión completa
+* latencia p50/p99 de la búsqueda
+* memoria estimada de vectores e índice HNSW
+
+Con `--synthetic N` se añaden N vectores aleatorios normalizados para que
+la latencia y la memoria reflejen un corpus de tamaño realista.
+
+Uso:
+    python benchmarks/matryoshka_dims.py [--dims 768,512,256,128] [--k 5] [--synthetic 50000]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from qdrant_client import QdrantClient
+from qdrant_client.models import Distance, PointStruct, SearchParams, VectorParams
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from matryoshka import reduce_dimension  # noqa: E402
+from benchmarks.index_profiles import (  # noqa: E402
+    GOLDEN_QUERIES, embed, load_points, percentile, synthetic_points, upload, wait_until_indexed
+)
+
+
+def estimate_memory(points: int, dim: int, m: int = 16) -> int:
+    """Vectores float32 más los enlaces del grafo HNSW (m por defecto de Qdrant)"""
+    return points * dim * 4 + points * m * 2 * 4
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--qdrant-host", default=os.getenv("QDRANT_HOST", "localhost"))
+    parser.add_argument("--qdrant-port", type=int, default=int(os.getenv("QDRANT_PORT", "6333")))
+    parser.add_argument("--ollama-url", default=f"http://{os.getenv('OLLAMA_HOST', 'localhost')}:{os.getenv('OLLAMA_PORT', '11434')}")
+    parser.add_argument("--model", default=os.getenv("EMBEDDING_MODEL", "nomic-embed-text:latest"))
+    parser.add_argument("--collection", default=os.getenv("COLLECTION_NAME", "documents"))
+    parser.add_argument("--dims", default="768,512,256,128")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--synthetic", type=int, default=0)
+    parser.add_argument("--keep", action="store_true", help="No borrar las colecciones temporales")
+    args = parser.parse_args()
+
+    client = QdrantClient(host=args.qdrant_host, port=args.qdrant_port, timeout=120)
+    source_points = load_points(client, args.collection)
+    if not source_points:
+        print(f"❌ La colección '{args.collection}' está vacía. Ejecuta antes el rag_loader.")
+        sys.exit(1)
+    full_dim = len(source_points[0].vector)
+    points = [PointStruct(id=p.id, vector=p.vector, payload=p.payload) for p in source_points]
+    points.extend(synthetic_points(args.synthetic, full_dim))
+    total_points = len(points)
+
+    queries = [item["query"] for item in json.loads(GOLDEN_QUERIES.read_text(encoding="utf-8"))]
+    query_vectors = embed(args.ollama_url, args.model, queries)
+    if len(query_vectors[0]) != full_dim:
+        print(f"❌ '{args.collection}' tiene dimensión {full_dim} y el modelo {len(query_vectors[0])}: "
+              f"hace falta una colección a dimensión completa (EMBEDDING_DIM=0)")
+        sys.exit(1)
+    print(f"📊 {total_points} puntos (dim completa={full_dim}), {len(queries)} consultas, k={args.k}\n")
+
+    exact = SearchParams(exact=True)
+    truths = None
+    rows = []
+    # La dimensión completa va siempre primero: es la referencia de recall
+    for dim in sorted({min(int(d), full_dim) for d in args.dims.split(",")} | {full_dim}, reverse=True):
+        collection = f"bench_matryoshka_{dim}"
+        client.recreate_collection(
+            collection_name=collection,
+            vectors_config=VectorParams(size=dim, distance=Distance.COSINE)
+        )
+        upload(client, collection, (PointStruct(id=p.id, vector=reduce_dimension(p.vector, dim), payload=p.payload)
+                                    for p in points))
+        wait_until_indexed(client, collection)
+
+        reduced_queries = [reduce_dimension(vector, dim) for vector in query_vectors]
+        if truths is None:
+            truths = [{hit.id for hit in client.search(collection_name=collection, query_vector=vector,
+                                                       limit=args.k, search_params=exact)}
+                      for vector in reduced_queries]
+
+        recalls, latencies = [], []
+        for vector, truth_ids in zip(reduced_queries, truths):
+            for _ in range(args.repeats):
+                start = time.perf_counter()
+                hits = client.search(collection_name=collection, query_vector=vector, limit=args.k)
+                latencies.append((time.perf_counter() - start) * 1000)
+            recalls.append(len(truth_ids & {hit.id for hit in hits}) / max(1, len(truth_ids)))
+
+        rows.append((dim, statistics.mean(recalls), percentile(latencies, 50), percentile(latencies, 99),
+                     estimate_memory(total_points, dim)))
+        if not args.keep:
+            client.delete_collection(collection)
+
+    full_memory = estimate_memory(total_points, full_dim)
+    print(f"{'dim':>5} {'recall@k':>9} {'p50 ms':>8} {'p99 ms':>8} {'RAM MiB':>9} {'vs completa':>12}")
+    for dim, recall, p50, p99, memory in rows:
+        print(f"{dim:>5} {recall:>9.3f} {p50:>8.2f} {p99:>8.2f} {memory / 2**20:>9.1f} {memory / full_memory:>12.0%}")
+
+
+if __name__ == "__main__":
+    main()
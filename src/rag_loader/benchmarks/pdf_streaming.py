@@ -0,0 +1,145 @@
+"""
+Benchmark de extracción de PDF: texto completo frente a streaming por páginas.
+
+Genera un PDF sintético de varios cientos de páginas con vocabulario de los
+documentos incluidos y lo trocea de dos formas, cada una en su propio
+subproceso para medir el pico de memoria (RSS) por separado:
+
+* ``completo``: el camino anterior, que concatena el texto de todas las
+  páginas con ``text +=`` y lo divide después con `_chunk_text`.
+* ``streaming``: `DocumentProcessor.extract_chunks`, el camino que usa la
+  ingesta: `_iter_pdf_pages` + `_iter_chunks` trocean a medida que llegan
+  las páginas, pero la lista de chunks sí se construye entera (la ingesta
+  necesita el total de chunks y sus hashes). Lo que se ahorra es el texto
+  completo y sus copias intermedias, no los chunks.
+
+Ambos modos se miden con ``CHUNK_STRATEGY=fixed`` y deben producir los
+mismos chunks; el script lo comprueba.
+
+Uso:
+    python benchmarks/pdf_streaming.py [--pages 600] [--pdf manual.pdf]
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from main import DocumentProcessor  # noqa: E402
+
+DOCUMENTS_DIR = Path(__file__).resolve().parent.parent / "documents"
+LINES_PER_PAGE = 60
+WORDS_PER_LINE = 14
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def build_pdf(path: Path, pages: int, seed: int = 7) -> Path:
+    """Escribir un PDF de texto plano (Helvetica) sin dependencias externas"""
+    source = " ".join(p.read_text(encoding="utf-8") for p in DOCUMENTS_DIR.glob("*.txt"))
+    words = [w for w in re.findall(r"[A-Za-z]+", source)] or ["hotel"]
+    rng = random.Random(seed)
+
+    objects = {1: b"<< /Type /Catalog /Pages 2 0 R >>",
+               3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"}
+    kids = []
+    for page in range(pages):
+        lines = [" ".join(rng.choice(words) for _ in range(WORDS_PER_LINE)) + "." for _ in range(LINES_PER_PAGE)]
+        content = "BT /F1 9 Tf 11 TL 40 800 Td\n" + "".join(f"({_pdf_escape(line)}) '\n" for line in lines) + "ET"
+        content_bytes = content.encode("latin-1")
+        page_id, content_id = 4 + page * 2, 5 + page * 2
+        objects[content_id] = b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content_bytes), content_bytes)
+        objects[page_id] = (b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id)
+        kids.append(page_id)
+    objects[2] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        " ".join(f"{kid} 0 R" for kid in kids).encode(), len(kids))
+
+    with open(path, "wb") as file:
+        file.write(b"%PDF-1.4\n")
+        offsets = {}
+        for obj_id in sorted(objects):
+            offsets[obj_id] = file.tell()
+            file.write(b"%d 0 obj\n%s\nendobj\n" % (obj_id, objects[obj_id]))
+        xref = file.tell()
+        size = max(objects) + 1
+        file.write(b"xref\n0 %d\n0000000000 65535 f \n" % size)
+        for obj_id in range(1, size):
+            file.write(b"%010d 00000 n \n" % offsets[obj_id])
+        file.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (size, xref))
+    return path
+
+
+def chunks_full(path: Path):
+    """Camino anterior: todo el texto en memoria antes de trocear"""
+    import PyPDF2
+    with open(path, "rb") as file:
+        text = ""
+        for page in PyPDF2.PdfReader(file).pages:
+            text += page.extract_text() + "\n"
+    return DocumentProcessor._chunk_text(text.strip())
+
+
+def chunks_streaming(path: Path):
+    """Camino de producción: la lista de chunks que devuelve `extract_chunks`"""
+    return DocumentProcessor.extract_chunks(path)
+
+
+def measure(mode: str, path: Path) -> dict:
+    """Ejecutado en un subproceso: trocea el PDF y recorre la lista de chunks resultante"""
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    digest = hashlib.sha256()
+    count = 0
+    for chunk in (chunks_full(path) if mode == "completo" else chunks_streaming(path)):
+        digest.update(chunk.encode("utf-8"))
+        count += 1
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss está en KiB en Linux
+    return {"chunks": count, "seconds": elapsed, "peak_rss_mb": peak / 1024,
+            "delta_rss_mb": (peak - baseline) / 1024, "digest": digest.hexdigest()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=600)
+    parser.add_argument("--pdf", type=Path, help="PDF a usar en lugar del sintético")
+    parser.add_argument("--measure", choices=["completo", "streaming"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.measure, args.pdf)))
+        return
+
+    import logging
+    logging.getLogger().setLevel(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf = args.pdf or build_pdf(Path(tmp) / "manual_sintetico.pdf", args.pages)
+        print(f"PDF: {pdf.name} ({pdf.stat().st_size / 1e6:.1f} MB)")
+        print(f"{'modo':<12} {'chunks':>8} {'segundos':>10} {'pico RSS MB':>12} {'Δ RSS MB':>10}")
+        digests = set()
+        for mode in ("completo", "streaming"):
+            output = subprocess.run([sys.executable, __file__, "--measure", mode, "--pdf", str(pdf)],
+                                    check=True, capture_output=True, text=True,
+                                    env={**os.environ, "CHUNK_STRATEGY": "fixed"}).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            digests.add(result["digest"])
+            print(f"{mode:<12} {result['chunks']:>8} {result['seconds']:>10.2f} "
+                  f"{result['peak_rss_mb']:>12.1f} {result['delta_rss_mb']:>10.1f}")
+        print("chunks idénticos" if len(digests) == 1 else "⚠️ los chunks difieren entre modos")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+import logging
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from qdrant_client.models import (
+    CollectionStatus,
+    CreateAlias,
+    CreateAliasOperation,
+    DeleteAlias,
+    DeleteAliasOperation,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class BlueGreenIndexer:
+    """
+    Reindexado sin cortes mediante alias de Qdrant.
+
+    La API de búsqueda consulta `alias_name` (p. ej. "documents"), que en
+    este modo es un alias y no una colección. Cada ingesta completa se
+    escribe en una colección nueva `<alias>_v<timestamp>`; cuando termina se
+    valida (número de points y una consulta de prueba) y el alias se cambia
+    de forma atómica. Si la validación falla, la colección nueva se borra y
+    el alias sigue apuntando a la versión anterior.
+
+    Las versiones retiradas se conservan `grace_period` segundos (para las
+    peticiones en curso y para poder volver atrás a mano) y después se borran.
+    """
+
+    def __init__(self, qdrant_client, alias_name: str, grace_period: int = 3600,
+                 min_point_ratio: float = 0.5, smoke_query: str = "check-in",
+                 index_timeout: int = 300):
+        self.qdrant_client = qdrant_client
+        self.alias_name = alias_name
+        self.grace_period = grace_period
+        self.min_point_ratio = min_point_ratio
+        self.smoke_query = smoke_query
+        self.index_timeout = index_timeout
+        self._version_pattern = re.compile(rf"^{re.escape(alias_name)}_v(\d+)$")
+
+    def new_collection_name(self) -> str:
+        """Nombre de la colección para la próxima versión"""
+        return f"{self.alias_name}_v{int(time.time())}"
+
+    def current_target(self) -> Optional[str]:
+        """Colección a la que apunta el alias ahora mismo (None si no hay alias)"""
+        for alias in self.qdrant_client.get_aliases().aliases:
+            if alias.alias_name == self.alias_name:
+                return alias.collection_name
+        return None
+
+    def _versions(self) -> List[Tuple[int, str]]:
+        """Colecciones versionadas existentes, de la más antigua a la más reciente"""
+        versions = []
+        for collection in self.qdrant_client.get_collections().collections:
+            match = self._version_pattern.match(collection.name)
+            if match:
+                versions.append((int(match.group(1)), collection.name))
+        return sorted(versions)
+
+    def _count(self, collection_name: str) -> int:
+        return self.qdrant_client.count(collection_name=collection_name, exact=True).count
+
+    def _wait_until_indexed(self, collection_name: str):
+        """Esperar a que Qdrant termine de optimizar la colección antes de servirla"""
+        deadline = time.monotonic() + self.index_timeout
+        while time.monotonic() < deadline:
+            status = self.qdrant_client.get_collection(collection_name).status
+            if status == CollectionStatus.GREEN:
+                return
+            time.sleep(2)
+        logger.warning(f"⚠️ '{collection_name}' sigue optimizándose tras {self.index_timeout}s; se publica igualmente")
+
+    def validate(self, processor, load_stats: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """Comprobar la colección nueva; devuelve el motivo del rechazo o None si es válida"""
+        collection_name = processor.collection_name
+        if load_stats and load_stats.get("files_failed"):
+            return f"{load_stats['files_failed']} ficheros fallaron durante la ingesta"
+
+        points = self._count(collection_name)
+        if not points:
+            return "la colección nueva está vacía"
+
+        current = self.current_target()
+        if current:
+            previous = self._count(current)
+            if previous and points < previous * self.min_point_ratio:
+                return (f"la colección nueva tiene {points} points frente a {previous} de '{current}' "
+                        f"(mínimo {self.min_point_ratio:.0%})")
+
+        # Consulta de prueba con el mismo modelo de embeddings que usará la API
+        results = self.qdrant_client.search(
+            collection_name=collection_name,
+            query_vector=processor._get_embedding(self.smoke_query),
+            limit=3
+        )
+        if not results or not all((result.payload or {}).get("text") for result in results):
+            return f"la consulta de prueba '{self.smoke_query}' no devolvió documentos válidos"
+
+        logger.info(f"✅ Validación superada: {points} points, consulta de prueba con {len(results)} resultados")
+        return None
+
+    def switch(self, collection_name: str) -> Optional[str]:
+        """Apuntar el alias a `collection_name` de forma atómica; devuelve el destino anterior"""
+        previous = self.current_target()
+        operations = []
+        if previous:
+            operations.append(DeleteAliasOperation(delete_alias=DeleteAlias(alias_name=self.alias_name)))
+        elif self.qdrant_client.collection_exists(self.alias_name):
+            # Migración desde el modo directo: un alias no puede llamarse igual que una colección.
+            # Es el único momento en que la búsqueda se queda sin colección (lo que tarda el borrado).
+            logger.warning(f"⚠️ '{self.alias_name}' es una colección; se sustituye por un alias")
+            self.qdrant_client.delete_collection(self.alias_name)
+        operations.append(CreateAliasOperation(
+            create_alias=CreateAlias(collection_name=collection_name, alias_name=self.alias_name)
+        ))
+        self.qdrant_client.update_collection_aliases(change_aliases_operations=operations)
+        logger.info(f"🔀 Alias '{self.alias_name}': {previous or '-'} → {collection_name}")
+        return previous
+
+    def collect_garbage(self) -> List[str]:
+        """Borrar las versiones retiradas hace más de `grace_period` segundos"""
+        current = self.current_target()
+        versions = self._versions()
+        now = time.time()
+        deleted = []
+        for position, (created_at, name) in enumerate(versions):
+            if name == current:
+                continue
+            # Una versión se retira cuando se crea la siguiente; las que no tienen
+            # siguiente son construcciones abandonadas y cuentan desde su creación
+            retired_at = versions[position + 1][0] if position + 1 < len(versions) else created_at
+            if now - retired_at >= self.grace_period:
+                self.qdrant_client.delete_collection(name)
+                deleted.append(name)
+                logger.info(f"🗑️ Versión antigua '{name}' eliminada")
+        return deleted
+
+    def promote(self, processor, load_stats: Optional[Dict[str, Any]] = None) -> bool:
+        """Validar la colección construida por `processor` y publicarla bajo el alias"""
+        collection_name = processor.collection_name
+        error = self.validate(processor, load_stats)
+        if error:
+            logger.error(f"💥 Versión '{collection_name}' rechazada: {error}. El alias no cambia")
+            self.qdrant_client.delete_collection(collection_name)
+            return False
+
+        self._wait_until_indexed(collection_name)
+        self.switch(collection_name)
+        # La versión se publica después del cambio para que la caché no guarde resultados antiguos
+        processor._bump_collection_version()
+        self.collect_garbage()
+        return True
@@ -0,0 +1,227 @@
+"""
+Chunker estructural para documentos de políticas.
+
+A diferencia de `DocumentProcessor._chunk_text` (ventanas de 1000 caracteres),
+este chunker respeta la estructura del documento:
+
+* Cabeceras Markdown (``#``, ``##``...) y secciones numeradas (``1.``,
+  ``2.3``) abren una sección nueva; una sección nunca se corta si cabe entera.
+* Secciones consecutivas con las mismas cabeceras superiores se agrupan
+  mientras quepan en el presupuesto, para no generar chunks diminutos.
+* Cada chunk lleva delante la ruta de cabeceras superiores ("A > B") como
+  contexto para el embedding.
+* Una sección mayor que el presupuesto se divide por párrafos, líneas,
+  frases y, en último caso, palabras; los trozos de la misma sección se
+  solapan en `overlap_tokens` y repiten la cabecera de la sección.
+* `max_tokens` es un límite estricto que incluye la ruta, la cabecera
+  repetida y el solape (el solape se recorta si no cabe). Sólo se supera si
+  la ruta y la cabecera por sí solas ya ocupan el presupuesto.
+
+El tamaño se mide en tokens estimados (palabras y signos de puntuación),
+sin depender del tokenizador del modelo. Procesa el texto como un flujo de
+trozos (p. ej. páginas de un PDF), igual que `_iter_chunks`.
+"""
+import os
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+MARKDOWN_HEADING_RE = re.compile(r"^(#{1,6})\s+(.+?)\s*#*$")
+NUMBERED_HEADING_RE = re.compile(r"^(\d+(?:\.\d+)*)[.)]?\s+(\S.*)$")
+SENTENCE_END_RE = re.compile(r"(?<=[.!?…])\s+")
+
+# Unidad de texto con el separador que la precede en el original
+Unit = Tuple[str, str]
+
+
+def count_tokens(text: str) -> int:
+    """Estimación de tokens: palabras y signos de puntuación"""
+    return len(TOKEN_RE.findall(text))
+
+
+def _lines(pieces: Iterable[str]) -> Iterator[str]:
+    pending = ""
+    for piece in pieces:
+        pending += piece
+        parts = pending.split("\n")
+        pending = parts.pop()
+        yield from parts
+    if pending:
+        yield pending
+
+
+class StructuredChunker:
+    def __init__(self, max_tokens: int = 250, overlap_tokens: int = 50):
+        self.max_tokens = max(max_tokens, 32)
+        self.overlap_tokens = min(max(overlap_tokens, 0), self.max_tokens // 2)
+
+    @classmethod
+    def from_env(cls) -> "StructuredChunker":
+        return cls(
+            max_tokens=int(os.getenv("CHUNK_SIZE", "250")),
+            overlap_tokens=int(os.getenv("CHUNK_OVERLAP", "50"))
+        )
+
+    @staticmethod
+    def _heading(line: str, markdown_only: bool = False) -> Optional[Tuple[int, str]]:
+        """Nivel y título si la línea es una cabecera"""
+        match = MARKDOWN_HEADING_RE.match(line)
+        if match:
+            return len(match.group(1)), match.group(2)
+        if markdown_only:
+            return None
+        match = NUMBERED_HEADING_RE.match(line)
+        # Una línea numerada corta y sin puntuación final es un título, no un punto de una lista
+        if match and len(line) <= 80 and not line.endswith(('.', ':', ';', ',')):
+            return match.group(1).count(".") + 2, line
+        return None
+
+    def _blocks(self, pieces: Iterable[str]) -> Iterator[str]:
+        """Párrafos (líneas separadas por líneas en blanco), sin el front matter YAML"""
+        lines = _lines(pieces)
+        block: List[str] = []
+        started = False
+        for line in lines:
+            line = line.rstrip()
+            if not started and line.strip():
+                started = True
+                if line.strip() == "---":
+                    for line in lines:
+                        if line.strip() == "---":
+                            break
+                    continue
+            if not line.strip():
+                if block:
+                    yield "\n".join(block)
+                    block = []
+            elif block and self._heading(line.strip(), markdown_only=True):
+                # Cabecera pegada al párrafo anterior
+                yield "\n".join(block)
+                block = [line]
+            else:
+                block.append(line)
+        if block:
+            yield "\n".join(block)
+
+    def _sections(self, pieces: Iterable[str]) -> Iterator[Tuple[str, List[str], bool]]:
+        """Secciones como (ruta de cabeceras superiores, bloques, empieza por cabecera)"""
+        path: List[Tuple[int, str]] = []
+        breadcrumb = ""
+        blocks: List[str] = []
+        has_heading = has_body = False
+        for block in self._blocks(pieces):
+            first, _, rest = block.partition("\n")
+            heading = self._heading(first.strip())
+            if heading is None:
+                blocks.append(block)
+                has_body = True
+                continue
+            if has_body:
+                yield breadcrumb, blocks, has_heading
+            level, title = heading
+            path = [(l, t) for l, t in path if l < level]
+            breadcrumb = " > ".join(t for _, t in path)
+            path.append((level, title))
+            blocks = [first.strip()]
+            has_heading, has_body = True, bool(rest.strip())
+            if has_body:
+                blocks.append(rest)
+        if has_body:
+            yield breadcrumb, blocks, has_heading
+
+    def _units(self, text: str, separator: str, budget: int) -> List[Unit]:
+        """Dividir un texto demasiado grande: líneas, después frases y por último palabras"""
+        if count_tokens(text) <= budget:
+            return [(separator, text)]
+        for pattern, joiner in (("\n", "\n"), (SENTENCE_END_RE, " ")):
+            parts = text.split(pattern) if isinstance(pattern, str) else pattern.split(text)
+            parts = [part for part in parts if part.strip()]
+            if len(parts) > 1:
+                units: List[Unit] = []
+                for index, part in enumerate(parts):
+                    units.extend(self._units(part, separator if index == 0 else joiner, budget))
+                return units
+        units = []
+        words: List[str] = []
+        tokens = 0
+        for word in text.split():
+            word_tokens = count_tokens(word)
+            if words and tokens + word_tokens > budget:
+                units.append((separator if not units else " ", " ".join(words)))
+                words, tokens = [], 0
+            words.append(word)
+            tokens += word_tokens
+        if words:
+            units.append((separator if not units else " ", " ".join(words)))
+        return units
+
+    @staticmethod
+    def _render(breadcrumb: str, units: List[Unit]) -> str:
+        body = "".join(separator + text for separator, text in units).strip()
+        return f"{breadcrumb}\n{body}" if breadcrumb else body
+
+    def split_stream(self, pieces: Iterable[str]) -> Iterator[str]:
+        """Emitir los chunks a medida que se completan las secciones"""
+        current: List[Unit] = []
+        current_breadcrumb = ""
+        current_tokens = 0
+
+        for breadcrumb, blocks, has_heading in self._sections(pieces):
+            # Cada trozo tiene que caber junto a la ruta y la cabecera que se repiten delante
+            breadcrumb_tokens = count_tokens(breadcrumb)
+            heading_tokens = count_tokens(blocks[0]) if has_heading else 0
+            unit_budget = max(min(self.max_tokens - self.overlap_tokens,
+                                  self.max_tokens - breadcrumb_tokens - heading_tokens), 1)
+            units = [unit for index, block in enumerate(blocks)
+                     for unit in self._units(block, "\n" if index == 1 and has_heading else "\n\n",
+                                             self.max_tokens - breadcrumb_tokens if index == 0 and has_heading
+                                             else unit_budget)]
+            tokens = sum(count_tokens(text) for _, text in units)
+
+            # Las secciones enteras se agrupan mientras compartan ruta y quepan
+            if current and (breadcrumb != current_breadcrumb or current_tokens + tokens > self.max_tokens):
+                yield self._render(current_breadcrumb, current)
+                current = []
+            if not current:
+                current_breadcrumb = breadcrumb
+                current_tokens = breadcrumb_tokens
+            if current_tokens + tokens <= self.max_tokens:
+                current.extend(units)
+                current_tokens += tokens
+                continue
+
+            # Sección mayor que el presupuesto: trozos solapados que repiten la cabecera
+            heading_unit = units[0] if has_heading else None
+            for unit in units:
+                unit_tokens = count_tokens(unit[1])
+                if current and current_tokens + unit_tokens > self.max_tokens:
+                    yield self._render(current_breadcrumb, current)
+                    # El solape se recorta para que ruta + cabecera + solape + trozo no pasen de max_tokens
+                    base_tokens = breadcrumb_tokens + (heading_tokens if heading_unit else 0)
+                    overlap_budget = min(self.overlap_tokens, self.max_tokens - base_tokens - unit_tokens)
+                    overlap: List[Unit] = []
+                    overlap_tokens = 0
+                    for previous in reversed(current):
+                        previous_tokens = count_tokens(previous[1])
+                        if previous is heading_unit or overlap_tokens + previous_tokens > overlap_budget:
+                            break
+                        overlap.insert(0, previous)
+                        overlap_tokens += previous_tokens
+                    current = ([heading_unit] if heading_unit else []) + overlap
+                    current_tokens = base_tokens + overlap_tokens
+                current.append(unit)
+                current_tokens += unit_tokens
+
+        if current:
+            yield self._render(current_breadcrumb, current)
+
+    def split(self, text: str) -> List[str]:
+        return list(self.split_stream([text]))
+
+
+def describe(strategy: str) -> Dict[str, Any]:
+    """Configuración efectiva de chunking (se guarda en los manifiestos de snapshot)"""
+    if strategy == "structured":
+        chunker = StructuredChunker.from_env()
+        return {"strategy": "structured", "max_tokens": chunker.max_tokens, "overlap_tokens": chunker.overlap_tokens}
+    return {"strategy": "fixed", "chunk_size": 1000, "overlap": 200}
@@ -0,0 +1,224 @@
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from incremental import IncrementalIndexer
+
+logger = logging.getLogger(__name__)
+
+# Firma barata de un fichero para detectar cambios sin leerlo
+Signature = Tuple[int, int]
+
+
+class LoaderDaemon:
+    """
+    Modo servicio del loader: sondea la carpeta de documentos, agrupa los
+    cambios (debounce) y los aplica de forma incremental con el mismo
+    `DocumentProcessor`, que mantiene abiertos los clientes de Qdrant y Ollama.
+
+    Un fichero se procesa cuando su firma (mtime, tamaño) lleva
+    `debounce` segundos sin cambiar, así que una copia a medias no se indexa.
+    Si la sincronización falla (p. ej. Qdrant caído) o quedan chunks sin
+    embedding (Ollama caído), el cambio sigue pendiente y se reintenta en el
+    siguiente sondeo. Un fichero sin texto extraíble (vacío o PDF de sólo
+    imágenes) no se reintenta hasta que cambie su firma.
+    """
+
+    def __init__(self, processor, documents_path: Path, poll_interval: float = 5.0, debounce: float = 10.0):
+        self.processor = processor
+        self.indexer = IncrementalIndexer(processor)
+        self.documents_path = documents_path
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._indexed: Dict[str, Signature] = {}
+        self._synced = False
+        # Cambios pendientes: nombre -> (firma nueva o None si se borró, último cambio visto)
+        self._pending: Dict[str, Tuple[Optional[Signature], float]] = {}
+        self._status: Dict[str, Any] = {"state": "starting", "runs": 0, "last_run": None, "last_error": None}
+
+    def _snapshot(self) -> Dict[str, Signature]:
+        snapshot = {}
+        for pattern in ("*.pdf", "*.txt"):
+            for file_path in self.documents_path.glob(pattern):
+                try:
+                    stat = file_path.stat()
+                except FileNotFoundError:
+                    continue
+                snapshot[file_path.name] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def _detect_changes(self):
+        """Comparar la carpeta con lo indexado y anotar los cambios pendientes"""
+        if not self.documents_path.exists():
+            # Un volumen desmontado no debe interpretarse como un borrado de todos los ficheros
+            logger.warning(f"⚠️ La carpeta {self.documents_path} no existe; no se aplican cambios")
+            return
+        now = time.monotonic()
+        snapshot = self._snapshot()
+        with self._lock:
+            for name in set(snapshot) | set(self._indexed) | set(self._pending):
+                signature = snapshot.get(name)
+                pending = self._pending.get(name)
+                if pending is not None:
+                    if pending[0] != signature:
+                        # Sigue cambiando: se reinicia el debounce
+                        self._pending[name] = (signature, now)
+                elif self._indexed.get(name) != signature:
+                    self._pending[name] = (signature, now)
+
+    def _ready_changes(self) -> Dict[str, Optional[Signature]]:
+        now = time.monotonic()
+        with self._lock:
+            return {name: signature for name, (signature, changed_at) in self._pending.items()
+                    if now - changed_at >= self.debounce}
+
+    def _apply(self, changes: Dict[str, Optional[Signature]], manifest: Optional[Dict[str, Any]] = None):
+        """Aplicar un lote de cambios estables y publicar una única versión nueva"""
+        started = time.time()
+        totals = {"updated": 0, "skipped": 0, "failed": 0, "failed_chunks": 0, "no_text": 0, "removed_files": 0,
+                  "embedded": 0, "reused": 0, "deleted": 0}
+        with self._lock:
+            self._status["state"] = "syncing"
+        errors = []
+        try:
+            if manifest is None:
+                manifest = self.indexer.load_manifest()
+            for name, signature in sorted(changes.items()):
+                try:
+                    if signature is None:
+                        if name in manifest:
+                            self.indexer.remove_file(name)
+                            totals["removed_files"] += 1
+                    else:
+                        stats = self.indexer.sync_file(self.documents_path / name, manifest.get(name))
+                        for key, value in stats.items():
+                            totals[key] += value
+                        if stats["no_text"]:
+                            # Se marca como indexado con su firma: sólo se reintenta si el fichero cambia
+                            logger.warning(f"⚠️ {name} no tiene texto extraíble; se ignora hasta que cambie")
+                        elif stats["failed"] or stats["failed_chunks"]:
+                            # No se marca como indexado: se reintenta en el siguiente sondeo
+                            logger.warning(f"⚠️ {name} no se indexó completo; sigue pendiente")
+                            continue
+                except Exception as e:
+                    # Lo que no se llegó a marcar como indexado sigue pendiente
+                    logger.error(f"❌ Error sincronizando {name}: {e}")
+                    totals["failed"] += 1
+                    errors.append(f"{name}: {e}")
+                    continue
+                self._mark_indexed(name, signature)
+            if totals["updated"] or totals["removed_files"]:
+                self.processor._bump_collection_version()
+        except Exception as e:
+            logger.error(f"❌ Error sincronizando cambios: {e}")
+            errors.append(str(e))
+
+        with self._lock:
+            self._status.update({
+                "state": "idle",
+                "runs": self._status["runs"] + 1,
+                "last_error": "; ".join(errors) or None,
+                "last_run": {
+                    "started_at": int(started),
+                    "duration_seconds": round(time.time() - started, 2),
+                    "files": sorted(changes),
+                    **totals,
+                },
+            })
+        logger.info(f"🔄 Cambios aplicados: {totals['updated']} actualizados, {totals['removed_files']} eliminados, "
+                    f"{totals['failed']} fallidos; {totals['embedded']} embeddings generados")
+
+    def _mark_indexed(self, name: str, signature: Optional[Signature]):
+        with self._lock:
+            if signature is None:
+                self._indexed.pop(name, None)
+            else:
+                self._indexed[name] = signature
+            # Si el fichero volvió a cambiar mientras se procesaba, queda pendiente
+            if self._pending.get(name, (None,))[0] == signature:
+                self._pending.pop(name, None)
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._status,
+                "queue_depth": len(self._pending),
+                "pending": sorted(self._pending),
+                "indexed_files": len(self._indexed),
+                "collection": self.processor.collection_name,
+                "poll_interval": self.poll_interval,
+                "debounce": self.debounce,
+            }
+
+    def initial_sync(self) -> bool:
+        """
+        Reconciliar la carpeta completa al arrancar. Los ficheros que fallan no
+        se marcan como indexados y quedan pendientes; si ni siquiera se puede
+        leer la colección, `run` repite la reconciliación en el siguiente sondeo.
+        """
+        if not self.documents_path.exists():
+            logger.warning(f"⚠️ La carpeta {self.documents_path} no existe; no se modifica la colección")
+            return False
+        try:
+            manifest = self.indexer.load_manifest()
+        except Exception as e:
+            logger.error(f"❌ Error en la sincronización inicial: {e}")
+            with self._lock:
+                self._status["last_error"] = str(e)
+            return False
+        snapshot = self._snapshot()
+        changes: Dict[str, Optional[Signature]] = dict(snapshot)
+        changes.update({name: None for name in manifest if name not in snapshot})
+        self._apply(changes, manifest)
+        self._synced = True
+        return True
+
+    def run(self):
+        logger.info(f"👀 Vigilando {self.documents_path} cada {self.poll_interval}s (debounce {self.debounce}s)")
+        while not self._stop.is_set():
+            try:
+                if not self._synced:
+                    self.initial_sync()
+                else:
+                    self._detect_changes()
+                    changes = self._ready_changes()
+                    if changes:
+                        self._apply(changes)
+            except Exception as e:
+                logger.error(f"❌ Error en el bucle de vigilancia: {e}")
+            self._stop.wait(self.poll_interval)
+
+    def stop(self):
+        self._stop.set()
+
+
+def serve_status(daemon: LoaderDaemon, port: int) -> ThreadingHTTPServer:
+    """Servir GET /status (y /health) en un hilo aparte"""
+
+    class StatusHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path not in ("/status", "/health"):
+                self.send_error(404)
+                return
+            status = daemon.status()
+            body = json.dumps(status if self.path == "/status" else {"status": "healthy",
+                                                                       "state": status["state"]}).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), StatusHandler)
+    threading.Thread(target=server.serve_forever, name="status-server", daemon=True).start()
+    logger.info(f"📡 Estado del loader en http://0.0.0.0:{port}/status")
+    return server
@@ -0,0 +1,243 @@
+"""
+Almacén persistente de embeddings direccionado por contenido.
+
+Cada modelo tiene su propio directorio con tres ficheros:
+
+* ``vectors.f32``: vectores float32 añadidos al final (append-only), que se
+  leen como un array de NumPy mapeado en memoria.
+* ``index.bin``: registros de 24 bytes (hash de 16 bytes de modelo + texto
+  y número de fila) también append-only.
+* ``meta.json``: modelo, dimensión y generación (cambia al compactar).
+
+Varios procesos (rag_loader y API de búsqueda) pueden compartir el
+directorio: las escrituras se serializan con ``flock`` y cada lectura, con
+el ``flock`` compartido, comprueba la generación e incorpora los registros
+nuevos del índice. Así ningún lector usa números de fila de antes de que
+otro proceso compactara el almacén.
+
+Uso desde línea de comandos:
+    python embedding_store.py stats --dir /app/embedding_cache --model nomic-embed-text
+    python embedding_store.py compact --dir /app/embedding_cache --model nomic-embed-text
+"""
+import argparse
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+INDEX_DTYPE = np.dtype([("key", "V16"), ("row", "<u8")])
+
+
+def model_slug(model: str) -> str:
+    """'nomic-embed-text:latest' y 'nomic-embed-text' comparten almacén"""
+    if model.endswith(":latest"):
+        model = model[:-len(":latest")]
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", model)
+
+
+class EmbeddingStore:
+    def __init__(self, root: Path, model: str):
+        self.model = model_slug(model)
+        self.path = Path(root) / self.model
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.vectors_path = self.path / "vectors.f32"
+        self.index_path = self.path / "index.bin"
+        self.meta_path = self.path / "meta.json"
+        self.lock_path = self.path / ".lock"
+        self._lock = threading.Lock()
+        self._index: Dict[bytes, int] = {}
+        self._index_offset = 0
+        self._generation = None
+        self._vectors: Optional[np.memmap] = None
+        self.dim: Optional[int] = None
+        with self._lock, self._file_lock(fcntl.LOCK_SH):
+            self._refresh()
+
+    def key(self, text: str) -> bytes:
+        return hashlib.blake2b(f"{self.model}\0{text}".encode("utf-8"), digest_size=16).digest()
+
+    # --- Lectura ---
+
+    def _read_meta(self) -> dict:
+        if not self.meta_path.exists():
+            return {}
+        return json.loads(self.meta_path.read_text(encoding="utf-8"))
+
+    def _refresh(self):
+        """
+        Incorporar lo que otros procesos hayan añadido desde la última lectura.
+        Quien llama debe tener el flock (compartido o exclusivo) del almacén.
+        """
+        meta = self._read_meta()
+        if meta.get("generation") != self._generation:
+            # Compactado (o creado) por otro proceso: se recarga todo
+            self._index, self._index_offset, self._vectors = {}, 0, None
+            self._generation = meta.get("generation")
+        self.dim = meta.get("dim")
+        if not self.index_path.exists():
+            return
+        size = self.index_path.stat().st_size
+        usable = size - (size - self._index_offset) % INDEX_DTYPE.itemsize
+        if usable <= self._index_offset:
+            return
+        records = np.fromfile(self.index_path, dtype=INDEX_DTYPE,
+                              count=(usable - self._index_offset) // INDEX_DTYPE.itemsize,
+                              offset=self._index_offset)
+        for record in records:
+            self._index[record["key"].tobytes()] = int(record["row"])
+        self._index_offset = usable
+
+    def _vector_rows(self) -> int:
+        if not self.dim or not self.vectors_path.exists():
+            return 0
+        return self.vectors_path.stat().st_size // (self.dim * 4)
+
+    def _vector_view(self, row: int) -> np.ndarray:
+        # El mapeo se descarta en _refresh al cambiar la generación: siempre es del fichero actual
+        if self._vectors is None or row >= self._vectors.shape[0]:
+            self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r",
+                                      shape=(self._vector_rows(), self.dim))
+        return self._vectors[row]
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """Vectores guardados para cada texto (None si no está)"""
+        keys = [self.key(text) for text in texts]
+        # Aunque la clave ya esté en el índice hay que releer meta.json: otro proceso puede haber
+        # compactado y entonces las filas conocidas ya no son válidas. El flock compartido
+        # impide además que se compacte mientras se leen los vectores.
+        with self._lock, self._file_lock(fcntl.LOCK_SH):
+            self._refresh()
+            return [self._vector_view(self._index[key]).tolist() if key in self._index else None
+                    for key in keys]
+
+    def get(self, text: str) -> Optional[List[float]]:
+        return self.get_many([text])[0]
+
+    # --- Escritura ---
+
+    @contextmanager
+    def _file_lock(self, mode: int = fcntl.LOCK_EX):
+        with open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, mode)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _write_meta(self, dim: int, generation: int):
+        tmp = self.meta_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"model": self.model, "dim": dim, "generation": generation}), encoding="utf-8")
+        os.replace(tmp, self.meta_path)
+
+    def put_many(self, texts: Sequence[str], vectors: Sequence[Sequence[float]]) -> int:
+        """Añadir los vectores que aún no estén guardados; devuelve cuántos se escribieron"""
+        with self._lock, self._file_lock():
+            self._refresh()
+            pending = {}
+            for text, vector in zip(texts, vectors):
+                key = self.key(text)
+                if key not in self._index and key not in pending:
+                    pending[key] = vector
+            if not pending:
+                return 0
+
+            matrix = np.asarray(list(pending.values()), dtype=np.float32)
+            if self.dim is None:
+                self.dim = matrix.shape[1]
+                self._generation = 0
+                self._write_meta(self.dim, self._generation)
+            elif matrix.shape[1] != self.dim:
+                raise ValueError(f"Dimensión {matrix.shape[1]} distinta de la del almacén ({self.dim})")
+
+            # Primero los vectores y después el índice: un lector nunca ve una fila a medio escribir
+            first_row = self._vector_rows()
+            if self.vectors_path.exists() and self.vectors_path.stat().st_size != first_row * self.dim * 4:
+                # Restos de una escritura interrumpida: se descarta la fila incompleta
+                os.truncate(self.vectors_path, first_row * self.dim * 4)
+            with open(self.vectors_path, "ab") as file:
+                file.write(matrix.tobytes())
+            records = np.zeros(len(pending), dtype=INDEX_DTYPE)
+            records["key"] = [np.void(key) for key in pending]
+            records["row"] = np.arange(first_row, first_row + len(pending), dtype=np.uint64)
+            with open(self.index_path, "ab") as file:
+                file.write(records.tobytes())
+            self._refresh()
+            return len(pending)
+
+    # --- Mantenimiento ---
+
+    def vectors_bytes(self) -> int:
+        """Tamaño actual del fichero de vectores, sin bloquear (para límites de tamaño)"""
+        return self.vectors_path.stat().st_size if self.vectors_path.exists() else 0
+
+    def stats(self) -> dict:
+        with self._lock, self._file_lock(fcntl.LOCK_SH):
+            self._refresh()
+            rows = self._vector_rows()
+            return {
+                "model": self.model,
+                "dim": self.dim,
+                "entries": len(self._index),
+                "rows": rows,
+                "dead_rows": rows - len(self._index),
+                "vectors_bytes": self.vectors_path.stat().st_size if self.vectors_path.exists() else 0,
+                "index_bytes": self.index_path.stat().st_size if self.index_path.exists() else 0,
+            }
+
+    def compact(self, keep_texts: Optional[Iterable[str]] = None) -> dict:
+        """
+        Reescribir el almacén sin filas huérfanas. Si se indica `keep_texts`,
+        sólo se conservan los embeddings de esos textos.
+        """
+        keep = {self.key(text) for text in keep_texts} if keep_texts is not None else None
+        with self._lock, self._file_lock():
+            self._refresh()
+            before = self._vector_rows()
+            if not self.dim:
+                return {"rows_before": 0, "rows_after": 0}
+            entries = [(key, row) for key, row in self._index.items() if keep is None or key in keep]
+            vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(before, self.dim))
+
+            tmp_vectors = self.vectors_path.with_suffix(".tmp")
+            tmp_index = self.index_path.with_suffix(".tmp")
+            records = np.zeros(len(entries), dtype=INDEX_DTYPE)
+            with open(tmp_vectors, "wb") as file:
+                for new_row, (key, row) in enumerate(entries):
+                    file.write(np.asarray(vectors[row], dtype=np.float32).tobytes())
+                    records[new_row] = (np.void(key), new_row)
+            records.tofile(tmp_index)
+            del vectors
+
+            os.replace(tmp_vectors, self.vectors_path)
+            os.replace(tmp_index, self.index_path)
+            self._write_meta(self.dim, (self._generation or 0) + 1)
+            self._refresh()
+            logger.info(f"🧹 Almacén de embeddings compactado: {before} → {len(entries)} filas")
+            return {"rows_before": before, "rows_after": len(entries)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mantenimiento del almacén de embeddings")
+    parser.add_argument("command", choices=["stats", "compact"])
+    parser.add_argument("--dir", default=os.getenv("EMBEDDING_CACHE_DIR", "/app/embedding_cache"))
+    parser.add_argument("--model", default=os.getenv("EMBEDDING_MODEL", "nomic-embed-text"))
+    args = parser.parse_args()
+
+    store = EmbeddingStore(Path(args.dir), args.model)
+    result = store.stats() if args.command == "stats" else store.compact()
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,198 @@
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from qdrant_client.models import (
+    FieldCondition,
+    Filter,
+    FilterSelector,
+    MatchValue,
+    PointIdsList,
+    SetPayload,
+    SetPayloadOperation,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def load_manifest(qdrant_client, collection_name: str) -> Dict[str, Dict[str, Any]]:
+    """Chunks indexados por fichero (ids, hashes de chunk y de fichero) a partir de los payloads"""
+    manifest: Dict[str, Dict[str, Any]] = {}
+    offset = None
+    while True:
+        points, offset = qdrant_client.scroll(
+            collection_name=collection_name,
+            limit=512,
+            offset=offset,
+            with_payload=["filename", "file_hash", "chunk_hash"],
+            with_vectors=False
+        )
+        for point in points:
+            payload = point.payload or {}
+            entry = manifest.setdefault(payload.get("filename", ""), {"file_hashes": set(), "points": {}})
+            entry["file_hashes"].add(payload.get("file_hash"))
+            entry["points"][str(point.id).replace("-", "")] = payload.get("chunk_hash")
+        if offset is None:
+            return manifest
+
+
+class IncrementalIndexer:
+    """
+    Reingesta incremental basada en hashes de contenido.
+
+    El manifiesto se reconstruye a partir de los payloads que ya están en
+    Qdrant (`filename`, `file_hash`, `chunk_hash`), así que no hace falta
+    ningún fichero de estado local. Por cada fichero:
+
+    * si su hash no ha cambiado, se salta sin extraer ni embeber nada;
+    * si ha cambiado, sólo se embeben los chunks nuevos, se actualiza el
+      payload posicional de los que se mantienen y se borran los que ya no
+      existen.
+
+    Los ficheros que desaparecen de la carpeta se eliminan de la colección.
+    """
+
+    def __init__(self, processor):
+        self.processor = processor
+        self.qdrant_client = processor.qdrant_client
+        self.collection_name = processor.collection_name
+
+    def load_manifest(self) -> Dict[str, Dict[str, Any]]:
+        """Leer de Qdrant qué chunks (id y hash) hay indexados por fichero"""
+        return load_manifest(self.qdrant_client, self.collection_name)
+
+    @staticmethod
+    def _is_up_to_date(entry: Optional[Dict[str, Any]], file_hash: str) -> bool:
+        if not entry or not entry["points"]:
+            return False
+        # Points sin chunk_hash vienen del modo completo antiguo y se regeneran
+        return entry["file_hashes"] == {file_hash} and all(entry["points"].values())
+
+    def sync_file(self, file_path: Path, entry: Optional[Dict[str, Any]] = None) -> Dict[str, int]:
+        """Sincronizar un fichero con la colección; devuelve contadores de la operación"""
+        stats = {"skipped": 0, "updated": 0, "failed": 0, "failed_chunks": 0, "no_text": 0,
+                 "embedded": 0, "reused": 0, "deleted": 0}
+        file_hash = self.processor.hash_file(file_path)
+        if self._is_up_to_date(entry, file_hash):
+            logger.info(f"⏭️ {file_path.name} sin cambios")
+            stats["skipped"] = 1
+            return stats
+
+        chunks = self.processor.extract_chunks(file_path)
+        if not chunks:
+            # Vacío, sólo imágenes o ilegible: reintentarlo no cambia nada mientras el fichero no cambie
+            stats["failed"] = 1
+            stats["no_text"] = 1
+            return stats
+
+        # Los chunks idénticos dentro del mismo fichero se distinguen por su número de aparición
+        planned = []
+        occurrences: Dict[str, int] = {}
+        for index, chunk in enumerate(chunks):
+            chunk_hash = self.processor.hash_text(chunk)
+            occurrence = occurrences.get(chunk_hash, 0)
+            occurrences[chunk_hash] = occurrence + 1
+            point_id = self.processor._generate_chunk_id(file_path.name, chunk_hash, occurrence)
+            planned.append((index, chunk, point_id))
+
+        existing = entry["points"] if entry else {}
+        new_chunks = [item for item in planned if item[2] not in existing]
+        kept_chunks = [item for item in planned if item[2] in existing]
+        planned_ids = {point_id for _, _, point_id in planned}
+        removed_ids = [point_id for point_id in existing if point_id not in planned_ids]
+
+        # Embeber y subir sólo los chunks nuevos
+        batch_size = self.processor.embedding_batch_size
+        for start in range(0, len(new_chunks), batch_size):
+            batch = new_chunks[start:start + batch_size]
+            embeddings = self.processor._embed_batch([chunk for _, chunk, _ in batch])
+            points = [
+                self.processor._build_point(file_path, index, len(chunks), chunk, embedding,
+                                            point_id=point_id, file_hash=file_hash)
+                for (index, chunk, point_id), embedding in zip(batch, embeddings)
+                if embedding is not None
+            ]
+            if points:
+                self.qdrant_client.upsert(collection_name=self.collection_name, points=points)
+            stats["embedded"] += len(points)
+            stats["failed_chunks"] += len(batch) - len(points)
+
+        # Los chunks que se mantienen pueden haber cambiado de posición
+        if kept_chunks:
+            self.qdrant_client.batch_update_points(
+                collection_name=self.collection_name,
+                update_operations=[
+                    SetPayloadOperation(set_payload=SetPayload(
+                        payload={"chunk_index": index, "total_chunks": len(chunks), "file_hash": file_hash},
+                        points=[point_id]
+                    ))
+                    for index, _, point_id in kept_chunks
+                ]
+            )
+            stats["reused"] = len(kept_chunks)
+
+        if removed_ids:
+            self.qdrant_client.delete(
+                collection_name=self.collection_name,
+                points_selector=PointIdsList(points=removed_ids)
+            )
+            stats["deleted"] = len(removed_ids)
+
+        if stats["failed_chunks"]:
+            # Sin el hash del fichero la próxima ejecución volverá a intentar los chunks que faltan
+            self.qdrant_client.set_payload(
+                collection_name=self.collection_name,
+                payload={"file_hash": None},
+                points=Filter(must=[FieldCondition(key="filename", match=MatchValue(value=file_path.name))])
+            )
+            logger.warning(f"⚠️ {file_path.name}: algunos chunks no se pudieron embeber; se reintentarán")
+
+        stats["updated"] = 1
+        logger.info(f"🔄 {file_path.name}: {stats['embedded']} chunks nuevos, {stats['reused']} reutilizados, "
+                    f"{stats['deleted']} eliminados")
+        return stats
+
+    def remove_file(self, filename: str) -> None:
+        """Eliminar de la colección todos los chunks de un fichero"""
+        self.qdrant_client.delete(
+            collection_name=self.collection_name,
+            points_selector=FilterSelector(
+                filter=Filter(must=[FieldCondition(key="filename", match=MatchValue(value=filename))])
+            )
+        )
+        logger.info(f"🗑️ {filename} eliminado de la colección")
+
+    def sync_folder(self, documents_path: Path) -> Dict[str, int]:
+        """Sincronizar la carpeta completa con la colección"""
+        if not documents_path.exists():
+            # Sin carpeta no se puede distinguir un borrado de un volumen sin montar
+            logger.error(f"La carpeta {documents_path} no existe; no se modifica la colección")
+            return {}
+        manifest = self.load_manifest()
+        files: List[Path] = self.processor.find_documents(documents_path)
+        totals = {"skipped": 0, "updated": 0, "failed": 0, "failed_chunks": 0, "no_text": 0, "embedded": 0,
+                  "reused": 0, "deleted": 0, "removed_files": 0}
+
+        for file_path in files:
+            try:
+                stats = self.sync_file(file_path, manifest.get(file_path.name))
+            except Exception as e:
+                logger.error(f"Error sincronizando {file_path.name}: {e}")
+                stats = {"failed": 1}
+            for key, value in stats.items():
+                totals[key] += value
+
+        present = {file_path.name for file_path in files}
+        for filename in manifest:
+            if filename not in present:
+                self.remove_file(filename)
+                totals["removed_files"] += 1
+
+        logger.info(f"Sincronización completada: {totals['updated']} actualizados, {totals['skipped']} sin cambios, "
+                    f"{totals['removed_files']} eliminados, {totals['failed']} fallidos; "
+                    f"{totals['embedded']} embeddings generados")
+
+        # Sólo se invalida la caché de búsquedas si la colección ha cambiado
+        if totals["updated"] or totals["removed_files"]:
+            self.processor._bump_collection_version()
+        return totals
@@ -1,18 +1,36 @@
 import os
 import logging
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Iterator, Optional
 import requests
 import json
 from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
+from qdrant_client.models import Distance, VectorParams, VectorParamsDiff, PointStruct
 import PyPDF2
 import hashlib
 import time
+import uuid
+
+import profiles
+from embedding_store import EmbeddingStore
+from matryoshka import reduce_dimension
+from bluegreen import BlueGreenIndexer
+import chunking
+from chunking import StructuredChunker
+from daemon import LoaderDaemon, serve_status
+from incremental import IncrementalIndexer
+from pipeline import IngestionPipeline
+from snapshots import SnapshotManager
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Estrategia de chunking: "fixed" (ventanas de caracteres) o "structured" (secciones y párrafos)
+CHUNK_STRATEGY = os.getenv("CHUNK_STRATEGY", "fixed").lower()
+
+# Punto de la colección auxiliar "<colección>_meta" que guarda el token de versión
+VERSION_POINT_ID = 1
+
 class DocumentProcessor:
     def __init__(self, 
                  qdrant_host: str = "localhost",
@@ -20,12 +38,28 @@ class DocumentProcessor:
                  ollama_host: str = "localhost",
                  ollama_port: int = 11434,
                  collection_name: str = "documents",
-                 embedding_model: str = "nomic-embed-text:latest"):
+                 embedding_model: str = "nomic-embed-text:latest",
+                 collection_profile: str = "default",
+                 embedding_batch_size: int = 32,
+                 embedding_cache_dir: Optional[str] = None,
+                 meta_collection_name: Optional[str] = None,
+                 embedding_dim: int = 0):
         
         self.qdrant_client = QdrantClient(host=qdrant_host, port=qdrant_port)
         self.ollama_url = f"http://{ollama_host}:{ollama_port}"
+        # Sesión HTTP reutilizable: conexiones keep-alive con Ollama entre lotes
+        self.http = requests.Session()
         self.collection_name = collection_name
+        # En modo blue/green la colección es una versión y el token se publica para el alias
+        self.meta_collection_name = meta_collection_name or f"{collection_name}_meta"
         self.embedding_model = embedding_model
+        # Dimensión Matryoshka de los vectores guardados (0 = la completa del modelo)
+        self.embedding_dim = max(0, embedding_dim)
+        self.collection_profile = collection_profile
+        self.profile = profiles.get_profile(collection_profile)
+        self.embedding_batch_size = max(1, embedding_batch_size)
+        # Almacén persistente de embeddings compartido entre ejecuciones (opcional)
+        self.embedding_store = EmbeddingStore(Path(embedding_cache_dir), embedding_model) if embedding_cache_dir else None
         
         # Crear colección si no existe
         self._create_collection()
@@ -35,6 +69,8 @@ class DocumentProcessor:
         try:
             collections = self.qdrant_client.get_collections()
             collection_names = [col.name for col in collections.collections]
+            # Tras un despliegue blue/green el nombre es un alias de Qdrant, no una colección
+            collection_names += [alias.alias_name for alias in self.qdrant_client.get_aliases().aliases]
             
             if self.collection_name not in collection_names:
                 # Obtener dimensión del modelo de embeddings
@@ -43,20 +79,102 @@ class DocumentProcessor:
                 
                 self.qdrant_client.create_collection(
                     collection_name=self.collection_name,
-                    vectors_config=VectorParams(size=vector_size, distance=Distance.COSINE)
-                    
+                    vectors_config=VectorParams(
+                        size=vector_size,
+                        distance=Distance.COSINE,
+                        on_disk=self.profile["on_disk"] or None
+                    ),
+                    hnsw_config=profiles.hnsw_config(self.profile),
+                    quantization_config=profiles.quantization_config(self.profile)
                 )
-                logger.info(f"Colección '{self.collection_name}' creada con dimensión {vector_size}")
+                logger.info(f"Colección '{self.collection_name}' creada con dimensión {vector_size} "
+                            f"(perfil {profiles.describe(self.collection_profile)})")
             else:
                 logger.info(f"Colección '{self.collection_name}' ya existe")
+                if self.embedding_dim:
+                    size = self.qdrant_client.get_collection(self.collection_name).config.params.vectors.size
+                    if size != self.embedding_dim:
+                        raise ValueError(f"La colección '{self.collection_name}' tiene dimensión {size} y "
+                                         f"EMBEDDING_DIM={self.embedding_dim}; hay que reindexar (INGEST_MODE=bluegreen)")
+                self._apply_profile()
+            
+            if self.profile["payload_indexes"]:
+                self._create_payload_indexes()
         except Exception as e:
             logger.error(f"Error creando colección: {e}")
             raise
     
+    def _apply_profile(self):
+        """
+        Aplicar el perfil a una colección existente. HNSW y cuantización se
+        cambian en caliente (Qdrant reindexa en segundo plano); lo que el perfil
+        no fija vuelve al valor por defecto, así que volver a "default" quita los ajustes.
+        """
+        self.qdrant_client.update_collection(
+            collection_name=self.collection_name,
+            hnsw_config=profiles.hnsw_update(self.profile),
+            quantization_config=profiles.quantization_update(self.profile)
+        )
+        vectors = self.qdrant_client.get_collection(self.collection_name).config.params.vectors
+        if bool(vectors.on_disk) != self.profile["on_disk"]:
+            try:
+                # "" es el vector sin nombre de la colección
+                self.qdrant_client.update_collection(
+                    collection_name=self.collection_name,
+                    vectors_config={"": VectorParamsDiff(on_disk=self.profile["on_disk"])}
+                )
+            except Exception as e:
+                logger.warning(f"⚠️ No se pudo cambiar on_disk={self.profile['on_disk']} en '{self.collection_name}' "
+                               f"({e}); hay que recrear la colección (INGEST_MODE=bluegreen)")
+        logger.info(f"Perfil {profiles.describe(self.collection_profile)} aplicado a '{self.collection_name}'")
+    
+    def _create_payload_indexes(self):
+        """Indexar los campos del payload usados en filtros (la operación es idempotente)"""
+        for field_name, field_schema in profiles.PAYLOAD_INDEXES.items():
+            self.qdrant_client.create_payload_index(
+                collection_name=self.collection_name,
+                field_name=field_name,
+                field_schema=field_schema
+            )
+        logger.info(f"Índices de payload creados: {', '.join(profiles.PAYLOAD_INDEXES)}")
+    
+    def _bump_collection_version(self) -> str:
+        """Publicar un nuevo token de versión para invalidar las cachés de la API de búsqueda"""
+        try:
+            collections = self.qdrant_client.get_collections()
+            if self.meta_collection_name not in [col.name for col in collections.collections]:
+                self.qdrant_client.create_collection(
+                    collection_name=self.meta_collection_name,
+                    vectors_config=VectorParams(size=1, distance=Distance.DOT)
+                )
+            
+            version = uuid.uuid4().hex
+            self.qdrant_client.upsert(
+                collection_name=self.meta_collection_name,
+                points=[
+                    PointStruct(
+                        id=VERSION_POINT_ID,
+                        vector=[1.0],
+                        payload={
+                            "collection": self.collection_name,
+                            "embedding_model": self.embedding_model,
+                            "embedding_dim": self.embedding_dim,
+                            "version": version,
+                            "updated_at": int(time.time())
+                        }
+                    )
+                ]
+            )
+            logger.info(f"🔖 Nueva versión de la colección '{self.collection_name}': {version}")
+            return version
+        except Exception as e:
+            logger.error(f"Error actualizando la versión de la colección: {e}")
+            raise
+    
     def _get_embedding(self, text: str) -> List[float]:
         """Obtener embedding usando Ollama"""
         try:
-            response = requests.post(
+            response = self.http.post(
                 f"{self.ollama_url}/api/embeddings",
                 json={
                     "model": self.embedding_model,
@@ -67,25 +185,88 @@ class DocumentProcessor:
             response.raise_for_status()
             
             result = response.json()
-            return result["embedding"]
+            return reduce_dimension(result["embedding"], self.embedding_dim)
         except Exception as e:
             logger.error(f"Error obteniendo embedding: {e}")
             raise
     
-    def _extract_text_from_pdf(self, file_path: Path) -> str:
+    def _get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Obtener embeddings de varios textos en una sola llamada (API /api/embed de Ollama)"""
+        response = self.http.post(
+            f"{self.ollama_url}/api/embed",
+            json={
+                "model": self.embedding_model,
+                "input": texts
+            },
+            timeout=60 + 5 * len(texts)
+        )
+        response.raise_for_status()
+        embeddings = response.json()["embeddings"]
+        if len(embeddings) != len(texts):
+            raise ValueError(f"Ollama devolvió {len(embeddings)} embeddings para {len(texts)} textos")
+        return embeddings
+    
+    def _embed_batch(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Embeddings de un lote. Primero se consulta el almacén persistente y sólo
+        los textos que faltan se piden a Ollama. El almacén guarda los vectores
+        completos; la reducción de dimensión se aplica al devolverlos.
+        """
+        if not self.embedding_store:
+            return self._reduce_many(self._embed_uncached(texts))
+        
+        embeddings = self.embedding_store.get_many(texts)
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            computed = self._embed_uncached([texts[i] for i in missing])
+            for i, embedding in zip(missing, computed):
+                embeddings[i] = embedding
+            stored = [(texts[i], embedding) for i, embedding in zip(missing, computed) if embedding is not None]
+            if stored:
+                self.embedding_store.put_many([text for text, _ in stored], [embedding for _, embedding in stored])
+        logger.info(f"🗄️ Almacén de embeddings: {len(texts) - len(missing)}/{len(texts)} reutilizados")
+        return self._reduce_many(embeddings)
+    
+    def _reduce_many(self, embeddings: List[Optional[List[float]]]) -> List[Optional[List[float]]]:
+        if not self.embedding_dim:
+            return embeddings
+        return [reduce_dimension(embedding, self.embedding_dim) if embedding is not None else None
+                for embedding in embeddings]
+    
+    def _embed_uncached(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Embeddings de un lote; si la llamada falla se divide el lote en dos y se
+        reintenta cada mitad. Los textos que fallan individualmente quedan a None.
+        """
+        try:
+            return self._get_embeddings(texts)
+        except Exception as e:
+            if len(texts) == 1:
+                logger.error(f"Error obteniendo embedding: {e}")
+                return [None]
+            middle = len(texts) // 2
+            logger.warning(f"⚠️ Lote de {len(texts)} embeddings fallido ({e}); reintentando en dos mitades")
+            return self._embed_uncached(texts[:middle]) + self._embed_uncached(texts[middle:])
+    
+    @staticmethod
+    def _iter_pdf_pages(file_path: Path) -> Iterator[str]:
+        """Generar el texto de un PDF página a página, sin tener el documento entero en memoria"""
+        with open(file_path, 'rb') as file:
+            pdf_reader = PyPDF2.PdfReader(file)
+            for page in pdf_reader.pages:
+                yield (page.extract_text() or "") + "\n"
+    
+    @staticmethod
+    def _extract_text_from_pdf(file_path: Path) -> str:
         """Extraer texto de archivo PDF"""
         try:
-            with open(file_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                text = ""
-                for page in pdf_reader.pages:
-                    text += page.extract_text() + "\n"
-                return text.strip()
+            return "".join(DocumentProcessor._iter_pdf_pages(file_path)).strip()
         except Exception as e:
             logger.error(f"Error extrayendo texto de PDF {file_path}: {e}")
             return ""
     
-    def _extract_text_from_txt(self, file_path: Path) -> str:
+    @staticmethod
+    def _extract_text_from_txt(file_path: Path) -> str:
         """Extraer texto de archivo TXT"""
         try:
             with open(file_path, 'r', encoding='utf-8') as file:
@@ -102,7 +283,8 @@ class DocumentProcessor:
             logger.error(f"No se pudo decodificar el archivo {file_path}")
             return ""
     
-    def _chunk_text(self, text: str, chunk_size: int = 1000, overlap: int = 200) -> List[str]:
+    @staticmethod
+    def _chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200) -> List[str]:
         """Dividir texto en chunks con overlap"""
         if len(text) <= chunk_size:
             return [text]
@@ -132,72 +314,183 @@ class DocumentProcessor:
         
         return chunks
     
+    @staticmethod
+    def _iter_chunks(pieces: Iterable[str], chunk_size: int = 1000, overlap: int = 200) -> Iterator[str]:
+        """
+        Versión incremental de `_chunk_text`: recibe el texto por trozos (p. ej.
+        páginas) y emite cada chunk en cuanto está completo. Produce exactamente
+        los mismos chunks que `_chunk_text("".join(pieces).strip())`, pero sólo
+        mantiene en memoria el texto pendiente desde el inicio del chunk actual.
+        """
+        buffer = ""
+        offset = 0          # Posición absoluta de buffer[0] en el texto
+        start = 0           # Inicio absoluto del chunk en curso
+        last_nonws = -1     # Último carácter no blanco visto (el texto final acaba ahí)
+        emitted = False
+        started = False
+        
+        def cut(end: int) -> int:
+            # Mismo punto de corte que `_chunk_text`, buscado con rfind en vez de carácter a carácter
+            low = start + chunk_size - 99 - offset
+            best = max(buffer.rfind(sep, low, end - offset + 1) for sep in (' ', '.', '\n', '!', '?'))
+            return best + offset + 1 if best >= 0 else end
+        
+        for piece in pieces:
+            if not started:
+                piece = piece.lstrip()
+                if not piece:
+                    continue
+                started = True
+            stripped = piece.rstrip()
+            if stripped:
+                last_nonws = offset + len(buffer) + len(stripped) - 1
+            buffer += piece
+            
+            # Un chunk se puede cerrar cuando el texto sigue más allá de su final
+            while last_nonws >= start + chunk_size:
+                end = cut(start + chunk_size)
+                chunk = buffer[start - offset:end - offset].strip()
+                if chunk:
+                    yield chunk
+                emitted = True
+                start = end - overlap
+                buffer = buffer[start - offset:]
+                offset = start
+        
+        length = last_nonws + 1
+        if length <= 0:
+            return
+        if not emitted and length <= chunk_size:
+            yield buffer[:length - offset]
+            return
+        
+        # Cola del texto: mismo bucle que `_chunk_text` con la longitud ya conocida
+        while start < length:
+            end = start + chunk_size
+            if end < length:
+                end = cut(end)
+            chunk = buffer[start - offset:min(end, length) - offset].strip()
+            if chunk:
+                yield chunk
+            start = end - overlap
+            if start >= length:
+                break
+    
     def _generate_document_id(self, file_path: Path, chunk_index: int) -> str:
         """Generar ID único para el documento"""
         content = f"{file_path.name}_{chunk_index}_{file_path.stat().st_mtime}"
         return hashlib.md5(content.encode()).hexdigest()
     
+    @staticmethod
+    def _generate_chunk_id(filename: str, chunk_hash: str, occurrence: int = 0) -> str:
+        """ID estable basado en el contenido: no cambia si el fichero sólo se toca"""
+        content = f"{filename}_{chunk_hash}_{occurrence}"
+        return hashlib.md5(content.encode()).hexdigest()
+    
+    @staticmethod
+    def hash_text(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+    
+    @staticmethod
+    def hash_file(file_path: Path) -> str:
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as file:
+            for block in iter(lambda: file.read(1024 * 1024), b""):
+                digest.update(block)
+        return digest.hexdigest()
+    
+    @staticmethod
+    def extract_chunks(file_path: Path) -> List[str]:
+        """
+        Extraer el texto de un fichero y dividirlo en chunks. No usa estado de
+        la instancia, así que puede ejecutarse en un pool de procesos.
+        """
+        # CHUNK_STRATEGY=structured respeta secciones y párrafos; "fixed" es el chunker original
+        chunker = StructuredChunker.from_env() if CHUNK_STRATEGY == "structured" else None
+        
+        # Los PDF se leen página a página y se trocean sobre la marcha
+        if file_path.suffix.lower() == '.pdf':
+            try:
+                pages = DocumentProcessor._iter_pdf_pages(file_path)
+                chunks = list(chunker.split_stream(pages) if chunker else DocumentProcessor._iter_chunks(pages))
+            except Exception as e:
+                logger.error(f"Error extrayendo texto de PDF {file_path}: {e}")
+                chunks = []
+        elif file_path.suffix.lower() == '.txt':
+            text = DocumentProcessor._extract_text_from_txt(file_path)
+            if not text:
+                chunks = []
+            else:
+                chunks = chunker.split(text) if chunker else DocumentProcessor._chunk_text(text)
+        else:
+            logger.warning(f"Tipo de archivo no soportado: {file_path.suffix}")
+            return []
+        
+        if not chunks:
+            logger.warning(f"No se pudo extraer texto de {file_path.name}")
+            return []
+        
+        logger.info(f"{file_path.name} dividido en {len(chunks)} chunks")
+        return chunks
+    
+    def _build_point(self, file_path: Path, chunk_index: int, total_chunks: int,
+                     chunk: str, embedding: List[float],
+                     point_id: Optional[str] = None, file_hash: Optional[str] = None) -> PointStruct:
+        """Crear el point de Qdrant para un chunk"""
+        return PointStruct(
+            id=point_id or self._generate_document_id(file_path, chunk_index),
+            vector=embedding,
+            payload={
+                "filename": file_path.name,
+                "file_path": str(file_path),
+                "chunk_index": chunk_index,
+                "total_chunks": total_chunks,
+                "text": chunk,
+                "file_type": file_path.suffix.lower(),
+                "processed_at": int(time.time()),
+                "chunk_hash": self.hash_text(chunk),
+                "file_hash": file_hash
+            }
+        )
+    
     def process_document(self, file_path: Path) -> bool:
         """Procesar un documento individual"""
         try:
             logger.info(f"Procesando: {file_path.name}")
             
-            # Extraer texto según el tipo de archivo
-            if file_path.suffix.lower() == '.pdf':
-                text = self._extract_text_from_pdf(file_path)
-            elif file_path.suffix.lower() == '.txt':
-                text = self._extract_text_from_txt(file_path)
-            else:
-                logger.warning(f"Tipo de archivo no soportado: {file_path.suffix}")
+            chunks = self.extract_chunks(file_path)
+            if not chunks:
                 return False
+            file_hash = self.hash_file(file_path)
             
-            if not text:
-                logger.warning(f"No se pudo extraer texto de {file_path.name}")
-                return False
-            
-            # Dividir en chunks
-            chunks = self._chunk_text(text)
-            logger.info(f"Documento dividido en {len(chunks)} chunks")
-            
-            # Procesar cada chunk
-            points = []
-            for i, chunk in enumerate(chunks):
-                try:
-                    # Generar embedding
-                    logger.info(f"Generando embedding para chunk {i+1}/{len(chunks)}")
-                    embedding = self._get_embedding(chunk)
-                    
-                    # Crear point para Qdrant
-                    point_id = self._generate_document_id(file_path, i)
-                    
-                    point = PointStruct(
-                        id=point_id,
-                        vector=embedding,
-                        payload={
-                            "filename": file_path.name,
-                            "file_path": str(file_path),
-                            "chunk_index": i,
-                            "total_chunks": len(chunks),
-                            "text": chunk,
-                            "file_type": file_path.suffix.lower(),
-                            "processed_at": int(time.time())
-                        }
+            # Procesar los chunks por lotes: una llamada de embedding y un upsert por lote
+            inserted = 0
+            for batch_start in range(0, len(chunks), self.embedding_batch_size):
+                batch = chunks[batch_start:batch_start + self.embedding_batch_size]
+                batch_end = batch_start + len(batch)
+                logger.info(f"Generando embeddings para chunks {batch_start + 1}-{batch_end}/{len(chunks)}")
+                embeddings = self._embed_batch(batch)
+                
+                points = []
+                for offset, (chunk, embedding) in enumerate(zip(batch, embeddings)):
+                    i = batch_start + offset
+                    if embedding is None:
+                        logger.error(f"Error procesando chunk {i}: sin embedding")
+                        continue
+                    points.append(self._build_point(file_path, i, len(chunks), chunk, embedding,
+                                                    file_hash=file_hash))
+                
+                # Insertar el lote en Qdrant
+                if points:
+                    self.qdrant_client.upsert(
+                        collection_name=self.collection_name,
+                        points=points
                     )
-                    points.append(point)
-                    
-                    logger.info(f"✅ Chunk {i+1}/{len(chunks)} procesado")
-                    
-                except Exception as e:
-                    logger.error(f"Error procesando chunk {i}: {e}")
-                    continue
+                    inserted += len(points)
+                    logger.info(f"✅ Chunks {batch_start + 1}-{batch_end}/{len(chunks)} procesados ({len(points)} insertados)")
             
-            # Insertar en Qdrant
-            if points:
-                self.qdrant_client.upsert(
-                    collection_name=self.collection_name,
-                    points=points
-                )
-                logger.info(f"✅ {file_path.name} procesado exitosamente ({len(points)} chunks)")
+            if inserted:
+                logger.info(f"✅ {file_path.name} procesado exitosamente ({inserted} chunks)")
                 return True
             else:
                 logger.error(f"No se pudieron crear points para {file_path.name}")
@@ -207,20 +500,27 @@ class DocumentProcessor:
             logger.error(f"Error procesando {file_path.name}: {e}")
             return False
     
-    def process_documents_folder(self, documents_path: Path):
-        """Procesar todos los documentos en la carpeta"""
+    def find_documents(self, documents_path: Path) -> List[Path]:
+        """Listar los archivos PDF y TXT de la carpeta"""
         if not documents_path.exists():
             logger.error(f"La carpeta {documents_path} no existe")
-            return
+            return []
         
         # Obtener todos los archivos PDF y TXT
         files = list(documents_path.glob("*.pdf")) + list(documents_path.glob("*.txt"))
         
         if not files:
             logger.warning("No se encontraron archivos PDF o TXT para procesar")
-            return
+            return []
         
         logger.info(f"Encontrados {len(files)} archivos para procesar")
+        return files
+    
+    def process_documents_folder(self, documents_path: Path) -> Dict[str, int]:
+        """Procesar todos los documentos en la carpeta"""
+        files = self.find_documents(documents_path)
+        if not files:
+            return {}
         
         successful = 0
         failed = 0
@@ -232,6 +532,12 @@ class DocumentProcessor:
                 failed += 1
         
         logger.info(f"Procesamiento completado: {successful} exitosos, {failed} fallidos")
+        
+        # Invalidar las respuestas cacheadas por la API de búsqueda
+        if successful:
+            self._bump_collection_version()
+        
+        return {"files_successful": successful, "files_failed": failed}
 
 def main():
     qdrant_host = os.getenv("QDRANT_HOST", "qdrant")
@@ -240,11 +546,23 @@ def main():
     ollama_port = int(os.getenv("OLLAMA_PORT", "11434"))
     collection_name = os.getenv("COLLECTION_NAME", "documents")
     embedding_model = os.getenv("EMBEDDING_MODEL", "nomic-embed-text:latest")
+    collection_profile = os.getenv("COLLECTION_PROFILE", "default")
+    embedding_batch_size = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+    embedding_cache_dir = os.getenv("EMBEDDING_CACHE_DIR") or None
+    embedding_dim = int(os.getenv("EMBEDDING_DIM", "0"))
+    use_pipeline = os.getenv("INGEST_PIPELINE", "false").lower() == "true"
+    ingest_mode = os.getenv("INGEST_MODE", "full").lower()
+    use_bluegreen = ingest_mode == "bluegreen"
+    use_daemon = os.getenv("LOADER_DAEMON", "false").lower() == "true"
+    snapshot_restore = os.getenv("SNAPSHOT_RESTORE", "false").lower() == "true"
+    snapshot_export = os.getenv("SNAPSHOT_EXPORT", "false").lower() == "true"
     
     logger.info("🚀 Iniciando procesador de documentos...")
     logger.info(f"📊 Qdrant: {qdrant_host}:{qdrant_port}")
     logger.info(f"🤖 Ollama: {ollama_host}:{ollama_port}")
-    logger.info(f"🧠 Modelo de embeddings: {embedding_model}")
+    logger.info(f"🧠 Modelo de embeddings: {embedding_model}" + (f" (dimensión {embedding_dim})" if embedding_dim else ""))
+    logger.info(f"🗂️ Perfil de colección: {profiles.describe(collection_profile)}")
+    logger.info(f"🔁 Modo de ingesta: {ingest_mode}")
     
     max_retries = 20
     retry_delay = 10
@@ -284,17 +602,101 @@ def main():
                 logger.error("💥 No se pudo conectar a los servicios después de varios intentos")
                 return
     
+    snapshots = SnapshotManager(
+        QdrantClient(host=qdrant_host, port=qdrant_port),
+        f"http://{qdrant_host}:{qdrant_port}",
+        Path(os.getenv("SNAPSHOT_DIR", "/app/snapshots"))
+    )
+    deployer = None
+    target_collection = collection_name
+    if use_bluegreen:
+        # La ingesta completa va a una colección nueva; el alias se cambia al validarla
+        deployer = BlueGreenIndexer(
+            QdrantClient(host=qdrant_host, port=qdrant_port),
+            alias_name=collection_name,
+            grace_period=int(os.getenv("BLUEGREEN_GRACE_SECONDS", "3600")),
+            min_point_ratio=float(os.getenv("BLUEGREEN_MIN_POINT_RATIO", "0.5")),
+            smoke_query=os.getenv("BLUEGREEN_SMOKE_QUERY", "check-in"),
+            index_timeout=int(os.getenv("BLUEGREEN_INDEX_TIMEOUT", "300"))
+        )
+        target_collection = deployer.new_collection_name()
+    
+    restored = False
+    if snapshot_restore:
+        # Entorno nuevo: cargar el snapshot antes de crear la colección evita reembeber el corpus.
+        # En blue/green se carga en la versión nueva y el alias pasa a apuntar a ella.
+        try:
+            loaded = snapshots.restore(collection_name, embedding_model, chunking.describe(CHUNK_STRATEGY),
+                                       embedding_dim, target_collection=target_collection)
+            if loaded and deployer:
+                deployer.switch(target_collection)
+            restored = loaded
+        except Exception as e:
+            logger.error(f"❌ Error restaurando el snapshot, se sigue con la ingesta normal: {e}")
+    
+    if deployer and not restored:
+        logger.info(f"🟦🟩 Blue/green: construyendo '{target_collection}' para el alias '{collection_name}'")
+    
     processor = DocumentProcessor(
         qdrant_host=qdrant_host,
         qdrant_port=qdrant_port,
         ollama_host=ollama_host,
         ollama_port=ollama_port,
-        collection_name=collection_name,
-        embedding_model=embedding_model
+        collection_name=target_collection,
+        embedding_model=embedding_model,
+        collection_profile=collection_profile,
+        embedding_batch_size=embedding_batch_size,
+        embedding_cache_dir=embedding_cache_dir,
+        meta_collection_name=f"{collection_name}_meta",
+        embedding_dim=embedding_dim
     )
     
     documents_path = Path("/app/documents")
-    processor.process_documents_folder(documents_path)
+    if use_daemon and use_bluegreen:
+        logger.warning("⚠️ LOADER_DAEMON no es compatible con INGEST_MODE=bluegreen; se ejecuta una sola vez")
+    elif use_daemon:
+        # Servicio permanente: sincronización inicial y después cambios incrementales
+        daemon = LoaderDaemon(
+            processor,
+            documents_path,
+            poll_interval=float(os.getenv("WATCH_INTERVAL", "5")),
+            debounce=float(os.getenv("WATCH_DEBOUNCE", "10"))
+        )
+        serve_status(daemon, int(os.getenv("STATUS_PORT", "8090")))
+        daemon.initial_sync()
+        daemon.run()
+        return
+    
+    load_stats = None
+    if restored:
+        # Sólo se reembeben los documentos que hayan cambiado desde la exportación
+        processor._bump_collection_version()
+        IncrementalIndexer(processor).sync_folder(documents_path)
+    elif ingest_mode == "incremental":
+        IncrementalIndexer(processor).sync_folder(documents_path)
+    elif use_pipeline:
+        pipeline = IngestionPipeline(
+            processor,
+            extract_workers=int(os.getenv("EXTRACT_WORKERS", str(os.cpu_count() or 2))),
+            embed_workers=int(os.getenv("EMBED_WORKERS", "4")),
+            queue_size=int(os.getenv("PIPELINE_QUEUE_SIZE", "8")),
+            write_batch_size=int(os.getenv("WRITE_BATCH_SIZE", "256"))
+        )
+        load_stats = pipeline.run(documents_path)
+    else:
+        load_stats = processor.process_documents_folder(documents_path)
+    
+    # Un snapshot restaurado ya está publicado bajo el alias
+    promoted = deployer.promote(processor, load_stats) if deployer and not restored else True
+    
+    # Una versión blue/green rechazada ya se ha borrado: no hay nada que exportar
+    if snapshot_export and promoted:
+        # Los ficheros llevan el nombre del alias para que otro entorno blue/green pueda restaurarlos
+        snapshots.export(collection_name, embedding_model, chunking.describe(CHUNK_STRATEGY),
+                         embedding_dim, source_collection=processor.collection_name)
+    
+    if processor.embedding_store:
+        logger.info(f"🗄️ Almacén de embeddings: {processor.embedding_store.stats()}")
     
     logger.info("🎉 Procesamiento completado")
 
@@ -0,0 +1,24 @@
+"""
+Reducción de dimensión tipo Matryoshka.
+
+nomic-embed-text se entrenó con Matryoshka Representation Learning: los
+primeros N componentes de cada embedding forman por sí solos un embedding
+válido. Truncar a N y volver a normalizar reduce memoria y coste de búsqueda
+a cambio de algo de recall.
+
+Se comparte entre el rag_loader y la API de búsqueda para que documentos y
+consultas se reduzcan exactamente igual. El almacén de embeddings guarda
+siempre los vectores completos, así que cambiar de dimensión no obliga a
+volver a llamar a Ollama.
+"""
+import math
+from typing import List, Sequence
+
+
+def reduce_dimension(vector: Sequence[float], dim: int) -> List[float]:
+    """Primeras `dim` componentes renormalizadas (0 o una dimensión mayor dejan el vector igual)"""
+    if not dim or dim >= len(vector):
+        return list(vector)
+    head = vector[:dim]
+    norm = math.sqrt(sum(value * value for value in head)) or 1.0
+    return [value / norm for value in head]
@@ -0,0 +1,240 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Dict, List
+
+logger = logging.getLogger(__name__)
+
+# Marca de fin para los hilos de las etapas
+_STOP = object()
+
+
+class IngestionPipeline:
+    """
+    Ingesta por etapas con colas acotadas:
+
+    1. Pool de procesos que extrae el texto y lo divide en chunks (CPU).
+    2. Hilos de embedding que envían lotes de chunks a Ollama (red).
+    3. Un hilo escritor que agrupa points y hace upserts no bloqueantes en Qdrant.
+
+    Las colas entre etapas tienen tamaño máximo, así que si Ollama o Qdrant
+    van más lentos las etapas anteriores se bloquean (backpressure) en lugar
+    de acumular memoria. Los points son los mismos que genera
+    `DocumentProcessor.process_document`.
+    """
+
+    def __init__(self, processor, extract_workers: int = 2, embed_workers: int = 4,
+                 queue_size: int = 8, write_batch_size: int = 256, report_interval: float = 5.0):
+        self.processor = processor
+        self.extract_workers = max(1, extract_workers)
+        self.embed_workers = max(1, embed_workers)
+        self.queue_size = max(1, queue_size)
+        self.write_batch_size = max(1, write_batch_size)
+        self.report_interval = report_interval
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Any] = {}
+
+    def _reset_stats(self, files_total: int):
+        self._stats = {
+            "files_total": files_total,
+            "files_extracted": 0,
+            "chunks_total": 0,
+            "chunks_embedded": 0,
+            "chunks_failed": 0,
+            "chunks_written": 0,
+            "written_by_file": {},
+            "started_at": time.perf_counter(),
+        }
+
+    def _add(self, key: str, amount: int = 1):
+        with self._lock:
+            self._stats[key] += amount
+
+    def _progress(self) -> str:
+        with self._lock:
+            stats = dict(self._stats)
+        elapsed = max(time.perf_counter() - stats["started_at"], 1e-6)
+        return (f"📈 Ficheros {stats['files_extracted']}/{stats['files_total']} | "
+                f"chunks embebidos {stats['chunks_embedded']}/{stats['chunks_total']} | "
+                f"escritos {stats['chunks_written']} | fallidos {stats['chunks_failed']} | "
+                f"{stats['chunks_embedded'] / elapsed:.1f} chunks/s | "
+                f"colas embed={self._embed_queue.qsize()} write={self._write_queue.qsize()}")
+
+    def _report_loop(self, stop: threading.Event):
+        while not stop.wait(self.report_interval):
+            logger.info(self._progress())
+
+    def _embed_loop(self):
+        while True:
+            item = self._embed_queue.get()
+            if item is _STOP:
+                return
+            file_path, start_index, total_chunks, texts = item
+            # Un hilo que muere deja bloqueados los put() de las otras etapas: cualquier error cuenta como fallo
+            try:
+                self._embed_item(file_path, start_index, total_chunks, texts)
+            except Exception as e:
+                logger.error(f"Error procesando chunks {start_index}-{start_index + len(texts) - 1} "
+                             f"de {file_path.name}: {e}")
+                self._add("chunks_failed", len(texts))
+
+    def _embed_item(self, file_path: Path, start_index: int, total_chunks: int, texts: List[str]):
+        try:
+            embeddings = self.processor._embed_batch(texts)
+        except Exception as e:
+            logger.error(f"Error generando embeddings de {file_path.name}: {e}")
+            embeddings = [None] * len(texts)
+
+        points = []
+        for offset, (chunk, embedding) in enumerate(zip(texts, embeddings)):
+            if embedding is None:
+                logger.error(f"Error procesando chunk {start_index + offset} de {file_path.name}: sin embedding")
+                continue
+            points.append(self.processor._build_point(file_path, start_index + offset, total_chunks, chunk, embedding))
+        self._add("chunks_embedded", len(points))
+        self._add("chunks_failed", len(texts) - len(points))
+        if points:
+            self._write_queue.put((file_path, points))
+
+    def _flush(self, buffer: List, wait_for_result: bool) -> bool:
+        points = [point for _, point in buffer]
+        try:
+            # Upsert no bloqueante: Qdrant lo aplica en segundo plano en orden de llegada
+            self.processor.qdrant_client.upsert(
+                collection_name=self.processor.collection_name,
+                points=points,
+                wait=wait_for_result
+            )
+        except Exception as e:
+            logger.error(f"Error insertando {len(points)} points en Qdrant: {e}")
+            self._add("chunks_failed", len(points))
+            return False
+        return True
+
+    def _confirm(self, buffer: List):
+        """Contar como escritos los points cuyo upsert ya está aplicado"""
+        with self._lock:
+            self._stats["chunks_written"] += len(buffer)
+            written = self._stats["written_by_file"]
+            for file_path, _ in buffer:
+                written[file_path.name] = written.get(file_path.name, 0) + 1
+
+    def _write_loop(self):
+        buffer = []
+        # Points enviados sin esperar: no cuentan como escritos hasta el upsert final con wait=True
+        unconfirmed = []
+        last_batch = []
+        while True:
+            item = self._write_queue.get()
+            if item is _STOP:
+                break
+            file_path, points = item
+            buffer.extend((file_path, point) for point in points)
+            while len(buffer) >= self.write_batch_size:
+                batch, buffer = buffer[:self.write_batch_size], buffer[self.write_batch_size:]
+                if self._flush(batch, wait_for_result=False):
+                    unconfirmed.extend(batch)
+                    last_batch = batch
+
+        # El último upsert espera confirmación para que todo lo anterior esté aplicado.
+        # Si el último lote ya salió sin esperar se reenvía (el upsert es idempotente).
+        if buffer:
+            final, confirmed = buffer, self._flush(buffer, wait_for_result=True)
+        elif last_batch:
+            # Si el reenvío falla, _flush ya cuenta como fallido el último lote
+            final, confirmed = [], self._flush(last_batch, wait_for_result=True)
+            if not confirmed:
+                unconfirmed = unconfirmed[:len(unconfirmed) - len(last_batch)]
+        else:
+            final, confirmed = [], True
+        if confirmed:
+            self._confirm(unconfirmed + final)
+        elif unconfirmed:
+            logger.error(f"Sin confirmación de Qdrant para {len(unconfirmed)} points enviados sin esperar")
+            self._add("chunks_failed", len(unconfirmed))
+
+    def _enqueue_chunks(self, file_path: Path, chunks: List[str]):
+        batch_size = self.processor.embedding_batch_size
+        for start in range(0, len(chunks), batch_size):
+            # put() bloquea si la cola está llena: backpressure hacia la extracción
+            self._embed_queue.put((file_path, start, len(chunks), chunks[start:start + batch_size]))
+
+    def _extract_all(self, files: List[Path]):
+        extract = type(self.processor).extract_chunks
+        pending_files = list(files)
+        max_in_flight = self.extract_workers * 2
+        with ProcessPoolExecutor(max_workers=self.extract_workers) as executor:
+            in_flight = {}
+            while pending_files or in_flight:
+                while pending_files and len(in_flight) < max_in_flight:
+                    file_path = pending_files.pop(0)
+                    in_flight[executor.submit(extract, file_path)] = file_path
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    file_path = in_flight.pop(future)
+                    try:
+                        chunks = future.result()
+                    except Exception as e:
+                        logger.error(f"Error extrayendo {file_path.name}: {e}")
+                        chunks = []
+                    self._add("files_extracted")
+                    self._add("chunks_total", len(chunks))
+                    if chunks:
+                        self._enqueue_chunks(file_path, chunks)
+
+    def run(self, documents_path: Path) -> Dict[str, Any]:
+        """Procesar la carpeta completa y devolver las estadísticas de la ingesta"""
+        files = self.processor.find_documents(documents_path)
+        if not files:
+            return {}
+
+        self._reset_stats(len(files))
+        self._embed_queue: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+        self._write_queue: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+        logger.info(f"🏭 Pipeline: {self.extract_workers} procesos de extracción, {self.embed_workers} hilos de embedding, "
+                    f"colas de {self.queue_size}, upserts de {self.write_batch_size} points")
+
+        stop_report = threading.Event()
+        reporter = threading.Thread(target=self._report_loop, args=(stop_report,), daemon=True)
+        embedders = [threading.Thread(target=self._embed_loop, name=f"embed-{i}", daemon=True)
+                     for i in range(self.embed_workers)]
+        writer = threading.Thread(target=self._write_loop, name="qdrant-writer", daemon=True)
+        reporter.start()
+        writer.start()
+        for thread in embedders:
+            thread.start()
+
+        try:
+            self._extract_all(files)
+        finally:
+            for _ in embedders:
+                self._embed_queue.put(_STOP)
+            for thread in embedders:
+                thread.join()
+            self._write_queue.put(_STOP)
+            writer.join()
+            stop_report.set()
+
+        logger.info(self._progress())
+        written_by_file = self._stats["written_by_file"]
+        successful = sum(1 for file_path in files if written_by_file.get(file_path.name))
+        failed = len(files) - successful
+        logger.info(f"Procesamiento completado: {successful} exitosos, {failed} fallidos")
+
+        # Invalidar las respuestas cacheadas por la API de búsqueda
+        if successful:
+            self.processor._bump_collection_version()
+
+        elapsed = time.perf_counter() - self._stats["started_at"]
+        return {
+            "files_successful": successful,
+            "files_failed": failed,
+            "chunks_total": self._stats["chunks_total"],
+            "chunks_written": self._stats["chunks_written"],
+            "chunks_failed": self._stats["chunks_failed"],
+            "elapsed_seconds": round(elapsed, 2),
+            "chunks_per_second": round(self._stats["chunks_written"] / elapsed, 2) if elapsed else 0.0,
+        }
@@ -0,0 +1,129 @@
+from typing import Any, Dict, Optional
+
+from qdrant_client.models import (
+    Disabled,
+    HnswConfigDiff,
+    PayloadSchemaType,
+    QuantizationSearchParams,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    SearchParams,
+)
+
+# Campos del payload por los que se filtra y que merecen índice
+PAYLOAD_INDEXES = {
+    "filename": PayloadSchemaType.KEYWORD,
+    "file_type": PayloadSchemaType.KEYWORD,
+}
+
+# Valores por defecto de Qdrant: son los que se aplican al volver a "default" una colección existente
+QDRANT_DEFAULT_HNSW_M = 16
+QDRANT_DEFAULT_HNSW_EF_CONSTRUCT = 100
+
+# Perfiles de colección. "default" reproduce la configuración original
+# (sólo tamaño y distancia coseno, parámetros por defecto de Qdrant).
+COLLECTION_PROFILES: Dict[str, Dict[str, Any]] = {
+    "default": {
+        "hnsw_m": None,
+        "hnsw_ef_construct": None,
+        "search_ef": None,
+        "on_disk": False,
+        "quantization": None,
+        "payload_indexes": False,
+    },
+    "balanced": {
+        "hnsw_m": 16,
+        "hnsw_ef_construct": 128,
+        "search_ef": 128,
+        "on_disk": False,
+        "quantization": None,
+        "payload_indexes": True,
+    },
+    "high_recall": {
+        "hnsw_m": 32,
+        "hnsw_ef_construct": 256,
+        "search_ef": 256,
+        "on_disk": False,
+        "quantization": None,
+        "payload_indexes": True,
+    },
+    "compact": {
+        # Vectores originales en disco, copia int8 en RAM y reescritura con los originales
+        "hnsw_m": 16,
+        "hnsw_ef_construct": 128,
+        "search_ef": 128,
+        "on_disk": True,
+        "quantization": {"type": "int8", "quantile": 0.99, "always_ram": True},
+        "rescore": True,
+        "oversampling": 2.0,
+        "payload_indexes": True,
+    },
+}
+
+
+def get_profile(name: str) -> Dict[str, Any]:
+    """Obtener un perfil por nombre"""
+    if name not in COLLECTION_PROFILES:
+        raise ValueError(
+            f"Perfil de colección desconocido '{name}'. Disponibles: {', '.join(COLLECTION_PROFILES)}"
+        )
+    return COLLECTION_PROFILES[name]
+
+
+def hnsw_config(profile: Dict[str, Any]) -> Optional[HnswConfigDiff]:
+    if profile["hnsw_m"] is None and profile["hnsw_ef_construct"] is None:
+        return None
+    return HnswConfigDiff(m=profile["hnsw_m"], ef_construct=profile["hnsw_ef_construct"])
+
+
+def quantization_config(profile: Dict[str, Any]) -> Optional[ScalarQuantization]:
+    quantization = profile.get("quantization")
+    if not quantization:
+        return None
+    return ScalarQuantization(
+        scalar=ScalarQuantizationConfig(
+            type=ScalarType.INT8,
+            quantile=quantization.get("quantile"),
+            always_ram=quantization.get("always_ram", True),
+        )
+    )
+
+
+def hnsw_update(profile: Dict[str, Any]) -> HnswConfigDiff:
+    """HNSW para actualizar una colección existente: lo que el perfil no fija vuelve al valor de Qdrant"""
+    return HnswConfigDiff(
+        m=profile["hnsw_m"] or QDRANT_DEFAULT_HNSW_M,
+        ef_construct=profile["hnsw_ef_construct"] or QDRANT_DEFAULT_HNSW_EF_CONSTRUCT,
+    )
+
+
+def quantization_update(profile: Dict[str, Any]):
+    """Cuantización para actualizar una colección existente; sin cuantización en el perfil se desactiva"""
+    return quantization_config(profile) or Disabled.DISABLED
+
+
+def search_params(profile: Dict[str, Any]) -> Optional[SearchParams]:
+    """Parámetros de búsqueda recomendados para el perfil"""
+    quantization = None
+    if profile.get("quantization"):
+        quantization = QuantizationSearchParams(
+            rescore=profile.get("rescore", True),
+            oversampling=profile.get("oversampling"),
+        )
+    if profile["search_ef"] is None and quantization is None:
+        return None
+    return SearchParams(hnsw_ef=profile["search_ef"], quantization=quantization)
+
+
+def describe(name: str) -> str:
+    profile = get_profile(name)
+    parts = [f"m={profile['hnsw_m'] or 'def'}", f"ef_construct={profile['hnsw_ef_construct'] or 'def'}",
+             f"ef={profile['search_ef'] or 'def'}"]
+    if profile["on_disk"]:
+        parts.append("on_disk")
+    if profile.get("quantization"):
+        parts.append(f"int8(rescore={profile.get('rescore', True)}, oversampling={profile.get('oversampling')})")
+    if profile["payload_indexes"]:
+        parts.append("payload_indexes")
+    return f"{name} [{', '.join(parts)}]"
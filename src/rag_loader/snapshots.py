@@ -0,0 +1,228 @@
+"""
+Snapshots de Qdrant como artefacto para arrancar entornos nuevos sin reembeber.
+
+La exportación guarda en `SNAPSHOT_DIR` dos ficheros por colección:
+
+* ``<colección>.snapshot``: snapshot descargado de Qdrant.
+* ``<colección>.manifest.json``: modelo de embeddings, dimensión, número de
+  points, configuración de chunking, sha256 del snapshot y el hash de
+  contenido de cada documento indexado.
+
+En modo blue/green los ficheros llevan el nombre del alias (no el de la
+colección versionada), así que el artefacto sirve para cualquier entorno.
+
+La restauración sólo se hace si la colección no existe o está vacía y el
+manifiesto corresponde al modelo configurado; en cualquier otro caso el
+loader sigue con la ingesta normal. En modo blue/green el snapshot se carga
+en una colección versionada nueva y el alias pasa a apuntar a ella. Tras
+restaurar, una sincronización incremental reembebe únicamente los
+documentos que hayan cambiado.
+
+Uso desde línea de comandos:
+    python snapshots.py export --collection documents
+    python snapshots.py restore --collection documents --model nomic-embed-text
+    python snapshots.py inspect --collection documents
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import requests
+from qdrant_client import QdrantClient
+
+import chunking
+from embedding_store import model_slug
+from incremental import load_manifest
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class SnapshotManager:
+    def __init__(self, qdrant_client: QdrantClient, qdrant_url: str, snapshot_dir: Path):
+        self.qdrant_client = qdrant_client
+        self.qdrant_url = qdrant_url.rstrip("/")
+        self.snapshot_dir = Path(snapshot_dir)
+
+    def _paths(self, collection_name: str):
+        return (self.snapshot_dir / f"{collection_name}.snapshot",
+                self.snapshot_dir / f"{collection_name}.manifest.json")
+
+    def _resolve(self, collection_name: str) -> str:
+        """Colección real detrás de un alias (o el mismo nombre si no es un alias)"""
+        for alias in self.qdrant_client.get_aliases().aliases:
+            if alias.alias_name == collection_name:
+                return alias.collection_name
+        return collection_name
+
+    def _has_data(self, collection_name: str) -> bool:
+        # count resuelve los alias; una colección inexistente no tiene datos
+        try:
+            return self.qdrant_client.count(collection_name=collection_name, exact=True).count > 0
+        except Exception:
+            return False
+
+    def read_manifest(self, collection_name: str) -> Optional[Dict[str, Any]]:
+        _, manifest_path = self._paths(collection_name)
+        if not manifest_path.exists():
+            return None
+        return json.loads(manifest_path.read_text(encoding="utf-8"))
+
+    def export(self, collection_name: str, embedding_model: str,
+               chunking_config: Optional[Dict[str, Any]] = None, embedding_dim: int = 0,
+               source_collection: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Crear un snapshot de la colección, descargarlo y escribir su manifiesto.
+        Los ficheros se nombran con `collection_name` (el alias en blue/green) y
+        el snapshot se toma de `source_collection`, o de la colección a la que
+        apunte el alias si no se indica.
+        """
+        self.snapshot_dir.mkdir(parents=True, exist_ok=True)
+        snapshot_path, manifest_path = self._paths(collection_name)
+        source = source_collection or self._resolve(collection_name)
+        info = self.qdrant_client.get_collection(source)
+        vectors = info.config.params.vectors
+        started = time.perf_counter()
+
+        snapshot = self.qdrant_client.create_snapshot(collection_name=source, wait=True)
+        try:
+            tmp_path = snapshot_path.with_suffix(".tmp")
+            with requests.get(f"{self.qdrant_url}/collections/{source}/snapshots/{snapshot.name}",
+                              stream=True, timeout=600) as response:
+                response.raise_for_status()
+                with open(tmp_path, "wb") as file:
+                    for block in response.iter_content(chunk_size=1024 * 1024):
+                        file.write(block)
+            os.replace(tmp_path, snapshot_path)
+        finally:
+            # El artefacto ya está fuera: no hace falta ocupar disco en Qdrant
+            self.qdrant_client.delete_snapshot(collection_name=source, snapshot_name=snapshot.name)
+
+        documents = {
+            filename: sorted(hash_ for hash_ in entry["file_hashes"] if hash_)
+            for filename, entry in load_manifest(self.qdrant_client, source).items()
+        }
+        manifest = {
+            "manifest_version": MANIFEST_VERSION,
+            "collection": collection_name,
+            "source_collection": source,
+            "embedding_model": model_slug(embedding_model),
+            "dimension": vectors.size,
+            "embedding_dim": embedding_dim,
+            "distance": str(vectors.distance.value if hasattr(vectors.distance, "value") else vectors.distance),
+            "points_count": self.qdrant_client.count(collection_name=source, exact=True).count,
+            "chunking": chunking_config or {},
+            "documents": documents,
+            "snapshot_file": snapshot_path.name,
+            "snapshot_sha256": _sha256(snapshot_path),
+            "snapshot_bytes": snapshot_path.stat().st_size,
+            "created_at": int(time.time()),
+        }
+        tmp_manifest = manifest_path.with_suffix(".tmp")
+        tmp_manifest.write_text(json.dumps(manifest, indent=2, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_manifest, manifest_path)
+        logger.info(f"📦 Snapshot de '{source}' exportado como '{collection_name}': "
+                    f"{manifest['points_count']} points, {manifest['snapshot_bytes'] / 1e6:.1f} MB en {time.perf_counter() - started:.1f}s")
+        return manifest
+
+    def check(self, collection_name: str, embedding_model: str,
+              chunking_config: Optional[Dict[str, Any]] = None, embedding_dim: int = 0,
+              target_collection: Optional[str] = None) -> Optional[str]:
+        """Motivo por el que no se puede restaurar (None si el snapshot es utilizable)"""
+        snapshot_path, _ = self._paths(collection_name)
+        manifest = self.read_manifest(collection_name)
+        if manifest is None or not snapshot_path.exists():
+            return f"no hay snapshot de '{collection_name}' en {self.snapshot_dir}"
+        if manifest.get("manifest_version") != MANIFEST_VERSION:
+            return f"versión de manifiesto {manifest.get('manifest_version')} no soportada"
+        if manifest.get("embedding_model") != model_slug(embedding_model):
+            return (f"el snapshot es del modelo {manifest.get('embedding_model')} y el configurado "
+                    f"es {model_slug(embedding_model)}")
+        if manifest.get("embedding_dim", 0) != embedding_dim:
+            return (f"el snapshot usa EMBEDDING_DIM={manifest.get('embedding_dim', 0)} y el configurado "
+                    f"es {embedding_dim}")
+        if chunking_config and manifest.get("chunking") and manifest["chunking"] != chunking_config:
+            # Con otro chunking la sincronización incremental no detectaría que hay que regenerar los chunks
+            return f"el snapshot usa chunking {manifest['chunking']} y el configurado es {chunking_config}"
+        if _sha256(snapshot_path) != manifest.get("snapshot_sha256"):
+            return "el sha256 del snapshot no coincide con el manifiesto"
+
+        for name in {collection_name, target_collection or collection_name}:
+            if self._has_data(name):
+                return f"la colección '{name}' ya tiene datos"
+        return None
+
+    def restore(self, collection_name: str, embedding_model: str,
+                chunking_config: Optional[Dict[str, Any]] = None, embedding_dim: int = 0,
+                target_collection: Optional[str] = None) -> bool:
+        """
+        Restaurar el snapshot de `collection_name` en `target_collection` (por
+        defecto la misma) si corresponde; devuelve False para seguir con la
+        ingesta normal. En blue/green el alias lo cambia quien llama.
+        """
+        target = target_collection or collection_name
+        reason = self.check(collection_name, embedding_model, chunking_config, embedding_dim, target)
+        if reason:
+            logger.info(f"⏭️ Snapshot no restaurado: {reason}")
+            return False
+
+        snapshot_path, _ = self._paths(collection_name)
+        started = time.perf_counter()
+        with open(snapshot_path, "rb") as file:
+            response = requests.post(
+                f"{self.qdrant_url}/collections/{target}/snapshots/upload",
+                params={"priority": "snapshot", "wait": "true"},
+                files={"snapshot": (snapshot_path.name, file)},
+                timeout=1800
+            )
+        response.raise_for_status()
+        points = self.qdrant_client.count(collection_name=target, exact=True).count
+        logger.info(f"⚡ Snapshot de '{collection_name}' restaurado en '{target}': {points} points "
+                    f"en {time.perf_counter() - started:.1f}s")
+        return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exportar y restaurar snapshots de colecciones")
+    parser.add_argument("command", choices=["export", "restore", "inspect"])
+    parser.add_argument("--collection", default=os.getenv("COLLECTION_NAME", "documents"))
+    parser.add_argument("--model", default=os.getenv("EMBEDDING_MODEL", "nomic-embed-text:latest"))
+    parser.add_argument("--dir", default=os.getenv("SNAPSHOT_DIR", "/app/snapshots"))
+    parser.add_argument("--qdrant-host", default=os.getenv("QDRANT_HOST", "localhost"))
+    parser.add_argument("--qdrant-port", type=int, default=int(os.getenv("QDRANT_PORT", "6333")))
+    args = parser.parse_args()
+
+    manager = SnapshotManager(
+        QdrantClient(host=args.qdrant_host, port=args.qdrant_port),
+        f"http://{args.qdrant_host}:{args.qdrant_port}",
+        Path(args.dir)
+    )
+    chunking_config = chunking.describe(os.getenv("CHUNK_STRATEGY", "fixed").lower())
+    embedding_dim = int(os.getenv("EMBEDDING_DIM", "0"))
+    if args.command == "export":
+        result = manager.export(args.collection, args.model, chunking_config, embedding_dim)
+    elif args.command == "restore":
+        result = {"restored": manager.restore(args.collection, args.model, chunking_config, embedding_dim)}
+    else:
+        result = manager.read_manifest(args.collection) or {}
+        result.pop("documents", None)
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()